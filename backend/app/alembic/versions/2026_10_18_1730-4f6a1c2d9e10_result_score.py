@@ -0,0 +1,64 @@
+"""result score
+
+Revision ID: 4f6a1c2d9e10
+Revises: 7153e26887f3
+Create Date: 2026-10-18 17:30:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from app.core.scoring import score_result
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f6a1c2d9e10'
+down_revision: Union[str, None] = '7153e26887f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    op.add_column('results', sa.Column('score', sa.Double(), server_default=sa.text("'Infinity'"), nullable=False))
+    op.add_column('results', sa.Column('tiebreak', sa.Double(), server_default=sa.text("'Infinity'"), nullable=False))
+
+    # existing rows are scored with the same parser the CRUD layer uses on write
+    connection = op.get_bind()
+    results = sa.table(
+        'results',
+        sa.column('complex_id'), sa.column('participant_id'), sa.column('view'),
+        sa.column('result'), sa.column('score'), sa.column('tiebreak'),
+    )
+    rows = connection.execute(
+        sa.select(results.c.complex_id, results.c.participant_id, results.c.view, results.c.result)
+        .execution_options(yield_per=BACKFILL_BATCH)
+    )
+    update = (
+        sa.update(results)
+        .where(
+            results.c.complex_id == sa.bindparam('b_complex_id'),
+            results.c.participant_id == sa.bindparam('b_participant_id'),
+        )
+        .values(score=sa.bindparam('b_score'), tiebreak=sa.bindparam('b_tiebreak'))
+    )
+    for partition in rows.partitions():
+        scored = []
+        for row in partition:
+            score, tiebreak = score_result(row.view, row.result)
+            scored.append({
+                'b_complex_id': row.complex_id, 'b_participant_id': row.participant_id,
+                'b_score': score, 'b_tiebreak': tiebreak,
+            })
+        connection.execute(update, scored)
+
+    op.create_index('ix_results_complex_id_score', 'results', ['complex_id', 'score', 'tiebreak'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_results_complex_id_score', table_name='results')
+    op.drop_column('results', 'tiebreak')
+    op.drop_column('results', 'score')
@@ -0,0 +1,44 @@
+"""foreign key indexes
+
+Revision ID: a3d5e7f90b12
+Revises: 4f6a1c2d9e10
+Create Date: 2026-10-18 19:00:41.902517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d5e7f90b12'
+down_revision: Union[str, None] = '4f6a1c2d9e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# lookups by a foreign key that no primary key or unique constraint leads with
+INDEXES = (
+    ('participants', 'competition_id'),
+    ('complexes', 'competition_id'),
+    ('payments', 'participant_id'),
+    ('qualifying_videos', 'participant_id'),
+    ('results', 'participant_id'),
+)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY does not block writes but can not run inside a transaction.
+    # If it fails it leaves an INVALID index behind that has to be dropped by hand.
+    with op.get_context().autocommit_block():
+        for table, column in INDEXES:
+            op.create_index(
+                op.f(f'ix_{table}_{column}'), table, [column], unique=False, postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in reversed(INDEXES):
+            op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table, postgresql_concurrently=True)
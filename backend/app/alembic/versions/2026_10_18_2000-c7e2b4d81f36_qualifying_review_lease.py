@@ -0,0 +1,37 @@
+"""qualifying review lease
+
+Revision ID: c7e2b4d81f36
+Revises: a3d5e7f90b12
+Create Date: 2026-10-18 20:00:41.271905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2b4d81f36'
+down_revision: Union[str, None] = 'a3d5e7f90b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('qualifying_videos', sa.Column('reviewed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('qualifying_videos', sa.Column('lease_owner', sa.String(length=255), nullable=True))
+    op.add_column('qualifying_videos', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_qualifying_videos_pending', 'qualifying_videos', ['complex_id', 'participant_id'],
+            unique=False, postgresql_where=sa.text('reviewed_at IS NULL'), postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_qualifying_videos_pending', table_name='qualifying_videos', postgresql_concurrently=True)
+    op.drop_column('qualifying_videos', 'lease_expires_at')
+    op.drop_column('qualifying_videos', 'lease_owner')
+    op.drop_column('qualifying_videos', 'reviewed_at')
@@ -0,0 +1,27 @@
+"""result version
+
+Revision ID: d9f1a3c5e7b2
+Revises: c7e2b4d81f36
+Create Date: 2026-10-18 21:00:17.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f1a3c5e7b2'
+down_revision: Union[str, None] = 'c7e2b4d81f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a constant default: no table rewrite, existing results start at version 1
+    op.add_column('results', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('results', 'version')
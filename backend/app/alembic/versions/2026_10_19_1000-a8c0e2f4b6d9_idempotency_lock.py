@@ -0,0 +1,27 @@
+"""idempotency lock
+
+Revision ID: a8c0e2f4b6d9
+Revises: f2a4c6e8b0d3
+Create Date: 2026-10-19 10:00:41.226870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c0e2f4b6d9'
+down_revision: Union[str, None] = 'f2a4c6e8b0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rows reserved before this revision count as abandoned, a retry may take them over
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'locked_until')
@@ -0,0 +1,26 @@
+"""idempotency lock owner
+
+Revision ID: b3d5f7a9c1e4
+Revises: a8c0e2f4b6d9
+Create Date: 2026-10-19 11:00:08.731942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d5f7a9c1e4'
+down_revision: Union[str, None] = 'a8c0e2f4b6d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('lock_owner', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'lock_owner')
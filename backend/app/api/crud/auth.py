@@ -1,29 +1,52 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...core.cache import TTLCache
+from ...core.config import settings
+from ...core.metrics import register_cache
 from ...db.models import Users
+from ...db.notify import listener, notify, is_local
 from sqlalchemy import insert, select
 
 
-def create_user_from_db(
-        user_in, session: Session
+USERS_CHANNEL = 'users'
+
+# principals of authenticated users by token subject
+user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+register_cache('auth', user_cache)
+
+
+def _on_users_change(payload: dict | None):
+    if payload is None:
+        user_cache.clear()
+    elif not is_local(payload):
+        user_cache.pop(payload['username'])
+
+
+listener.subscribe(USERS_CHANNEL, _on_users_change)
+
+
+async def create_user_from_db(
+        user_in, session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         insert(Users)
         .values(user_in.model_dump(exclude_unset=True))
         .returning(Users)
-    ).one()
+    )).one()
 
-    session.commit()
+    await notify(session, USERS_CHANNEL, {'username': result.username})
+    await session.commit()
+    user_cache.pop(result.username)
 
     return result
 
 
-def get_user_from_db(
-        username: str, session: Session
+async def get_user_from_db(
+        username: str, session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         select(Users)
         .where(Users.username == username)
-    ).first()
+    )).first()
 
     return result
 
@@ -1,102 +1,156 @@
-from sqlalchemy.orm import Session, contains_eager, aliased, selectinload, joinedload
-from sqlalchemy import select, text, update, delete
+from sqlalchemy.orm import contains_eager, aliased, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, insert, update, delete
 from fastapi import HTTPException
 from ..schemas.competitions import (
-    CompetitionCreate, CompetitionUpdate, ContributionCreate, ContributionUpdate, ComplexesCreate, ResultsCreate
+    CompetitionCreate, CompetitionUpdate, ContributionCreate, ContributionUpdate, ComplexesCreate, ResultsCreate,
+    ResultOrder, ResultCorrection, CorrectionStatus
 )
 from ..dependencies.competition import CurrentCompetition
-from ...db.models import Competitions, Contributions, Complexes, Results
+from ..dependencies.pagination import Page
+from ...db.models import Competitions, Contributions, Complexes, Results, Participants
+from ...core.scoring import score_result
+from .leaderboard import notify_leaderboard_change, update_cached_leaderboard, leaderboard_cache
+from .live import publish_live_event
+from .results_import import ComplexNotFound
 from ..log import Logger
 
 log = Logger(__name__, 'app/base.log').logger
 
-def create_competition_from_db(
-        session: Session, competition: CompetitionCreate
+async def create_competition_from_db(
+        session: AsyncSession, competition: CompetitionCreate
 ):
     db_obj = Competitions(**competition.dict())
     session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
     return db_obj
 
 
-def get_competition_from_db(
-        competition_id: int, session: Session
+async def get_competition_from_db(
+        competition_id: int, session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         select(Competitions)
         .options(joinedload(Competitions.contribution))
         .filter_by(id=competition_id)
-    ).unique().one()
+    )).unique().one()
 
     return result
 
-def get_all_competition_from_db(session:Session):
 
-    result = session.scalars(
+async def get_competition_snapshot_from_db(
+        competition_id: int, session: AsyncSession
+):
+    """ The competition with everything below it, one query per table """
+    result = (await session.scalars(
         select(Competitions)
-    ).all()
+        .options(
+            selectinload(Competitions.contribution),
+            selectinload(Competitions.complex).selectinload(Complexes.result),
+            selectinload(Competitions.participant),
+        )
+        .filter_by(id=competition_id)
+    )).one()
+
+    return result
+
+
+async def get_competition_version_from_db(
+        competition_id: int, session: AsyncSession
+) -> str | None:
+    """
+    Fingerprint of a competition and its rows: row count and the sum of
+    ``xmin`` per table, which moves on every insert, update and delete.
+    None when the competition does not exist.
+    """
+    version = (await session.execute(text(
+        'SELECT c.xmin::text AS competition, '
+        "  (SELECT count(*) || '.' || coalesce(sum(xmin::text::bigint), 0) "
+        '   FROM contributions WHERE competition_id = c.id) AS contributions, '
+        "  (SELECT count(*) || '.' || coalesce(sum(xmin::text::bigint), 0) "
+        '   FROM complexes WHERE competition_id = c.id) AS complexes, '
+        "  (SELECT count(*) || '.' || coalesce(sum(xmin::text::bigint), 0) "
+        '   FROM participants WHERE competition_id = c.id) AS participants, '
+        "  (SELECT count(*) || '.' || coalesce(sum(r.xmin::text::bigint), 0) "
+        '   FROM results r JOIN complexes x ON x.id = r.complex_id WHERE x.competition_id = c.id) AS results '
+        'FROM competitions c WHERE c.id = :competition_id'
+    ), {'competition_id': competition_id})).first()
+
+    return None if version is None else ':'.join(version)
+
+
+async def get_all_competition_from_db(session: AsyncSession, page: Page | None = None):
+    query = select(Competitions)
+    if page is not None:
+        query = page.keyset(query, Competitions.id)
+
+    result = (await session.scalars(query)).all()
 
     return result
 
-def update_competition_from_db(
+async def update_competition_from_db(
         current_competition: CurrentCompetition, updated_competition_data:CompetitionUpdate,
-        session: Session
+        session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         update(Competitions)
         .where(Competitions.id==current_competition.id)
         .values(**updated_competition_data.model_dump(exclude_unset=True))
         .returning(Competitions)
-    ).one()
+    )).one()
 
-    session.commit()
+    await session.commit()
 
     return result
 
 
-def delete_competition_from_db(
-        current_competition:CurrentCompetition, session: Session
+async def delete_competition_from_db(
+        current_competition:CurrentCompetition, session: AsyncSession
 ):
-    session.delete(current_competition)
-    session.commit()
+    # the foreign keys cascade, nothing below the competition is loaded
+    await session.execute(delete(Competitions).where(Competitions.id == current_competition.id))
+    await notify_leaderboard_change(session, current_competition.id)
+    await session.commit()
+    leaderboard_cache.invalidate(current_competition.id)
     return True
 
 
-def create_contribution_from_db(
+async def create_contribution_from_db(
         competition_id: CurrentCompetition, contribution: ContributionCreate,
-        session: Session
+        session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         insert(Contributions)
         .values(
             competition_id=competition_id,
             **contribution.model_dump(exclude_unset=True),
             )
         .returning(Contributions)
-    ).one()
+    )).one()
 
-    session.commit()
+    await session.commit()
 
     return result
 
 
-def get_contributions_from_db(
-        competition_id: int, session: Session
+async def get_contributions_from_db(
+        competition_id: int, session: AsyncSession, page: Page | None = None
 ):
-    result = session.scalars(
-        select(Contributions)
-        .where(Contributions.competition_id==competition_id)
-    ).all()
+    query = select(Contributions).where(Contributions.competition_id==competition_id)
+    if page is not None:
+        query = page.keyset(query, Contributions.mode)
+
+    result = (await session.scalars(query)).all()
 
     return result
 
 
-def update_contribution_from_db(
+async def update_contribution_from_db(
         competition_id: int, contribution_mode:str,
-        contribution_in: ContributionUpdate, session:Session
+        contribution_in: ContributionUpdate, session: AsyncSession
 ):
-    result = session.scalars(
+    result = (await session.scalars(
         update(Contributions)
         .where(
             Contributions.competition_id==competition_id,
@@ -104,63 +158,211 @@ def update_contribution_from_db(
         )
         .values(**contribution_in.model_dump(exclude_unset=True))
         .returning(Contributions)
-    ).one()
+    )).one()
+
+    await session.commit()
 
     return result
 
 
-def delete_contribution_from_db(
-        competition_id: int, contribution_mode:str, session:Session
+async def delete_contribution_from_db(
+        competition_id: int, contribution_mode:str, session: AsyncSession
 ):
-    session.scalars(
+    (await session.scalars(
         delete(Contributions)
         .where(Contributions.competition_id==competition_id,
                Contributions.mode==contribution_mode)
         .returning(Contributions.competition_id)
-    ).one()
+    )).one()
+
+    await session.commit()
 
-def create_complex_from_db(
-        competition_id:int, complex_data:ComplexesCreate, session:Session
+async def create_complex_from_db(
+        competition_id:int, complex_data:ComplexesCreate, session: AsyncSession
 ):
     complex = Complexes(competition_id=competition_id, **complex_data.dict())
     session.add(complex)
-    session.commit()
-    session.refresh(complex)
+    await session.commit()
+    await session.refresh(complex)
 
     return complex
 
 
-def get_all_complexes_from_db(
-    competition_id:int, session:Session
+async def get_all_complexes_from_db(
+    competition_id:int, session: AsyncSession, page: Page | None = None,
+    is_qualifying: bool | None = None
 ):
-    complexes = session.scalars(
-        select(Complexes)
-        .where(Complexes.competition_id==competition_id)
-    ).all()
+    query = select(Complexes).where(Complexes.competition_id==competition_id)
+    if is_qualifying is not None:
+        query = query.where(Complexes.is_qualifying==is_qualifying)
+    if page is not None:
+        query = page.keyset(query, Complexes.id)
+
+    complexes = (await session.scalars(query)).all()
 
     return complexes
 
 
-def create_result_complex_from_db(
-    complex_id: int, participant_id: int, session:Session,
+async def create_result_complex_from_db(
+    complex_id: int, participant_id: int, session: AsyncSession,
     result_data: ResultsCreate
 ):
+    context = (await session.execute(
+        select(
+            Complexes.competition_id,
+            select(Participants.fullname).where(Participants.id==participant_id)
+            .scalar_subquery().label('fullname')
+        )
+        .where(Complexes.id==complex_id)
+    )).first()
+    score, tiebreak = score_result(result_data.view, result_data.result)
     result = Results(
         complex_id=complex_id, participant_id=participant_id,
-        **result_data.dict()
+        score=score, tiebreak=tiebreak, **result_data.dict()
     )
     session.add(result)
-    session.commit()
-    session.refresh(result)
+    if context:
+        await notify_leaderboard_change(session, context.competition_id, complex_id)
+        await publish_live_event(
+            session, 'result', context.competition_id, complex_id, participant_id=participant_id,
+            fullname=context.fullname, view=result.view, result=result.result
+        )
+    await session.commit()
+    await session.refresh(result)
+    if context:
+        update_cached_leaderboard(context.competition_id, {
+            'complex_id': complex_id, 'participant_id': participant_id,
+            'view': result.view, 'result': result.result, 'fullname': context.fullname,
+            'score': score, 'tiebreak': tiebreak,
+        })
     return result
 
 
-def get_all_result_complexes_from_db(
-    complex_id: int, session:Session
+CORRECT_RESULTS = text(
+    'WITH corrections AS ('
+    '  SELECT * FROM unnest('
+    '    CAST(:participant_ids AS integer[]), CAST(:views AS viewresult[]), CAST(:results AS varchar[]),'
+    '    CAST(:scores AS double precision[]), CAST(:tiebreaks AS double precision[]), CAST(:versions AS integer[])'
+    '  ) AS c(participant_id, view, result, score, tiebreak, expected)'
+    '), applied AS ('
+    '  INSERT INTO results (complex_id, participant_id, view, result, score, tiebreak, version)'
+    '  SELECT :complex_id, c.participant_id, c.view, c.result, c.score, c.tiebreak, coalesce(c.expected, 0) + 1'
+    '  FROM corrections c'
+    '  JOIN participants p ON p.id = c.participant_id AND p.competition_id = :competition_id'
+    # a version for a result that is not stored is a conflict, not a new row
+    '  WHERE c.expected IS NULL OR EXISTS ('
+    '    SELECT FROM results r WHERE r.complex_id = :complex_id AND r.participant_id = c.participant_id'
+    '  )'
+    '  ON CONFLICT (complex_id, participant_id) DO UPDATE SET'
+    '    view = excluded.view, result = excluded.result,'
+    '    score = excluded.score, tiebreak = excluded.tiebreak, version = excluded.version'
+    # compare and set: only the judge who saw the current version wins
+    '  WHERE results.version = excluded.version - 1'
+    '  RETURNING participant_id, version'
+    ')'
+    'SELECT c.participant_id, p.id IS NOT NULL AS found, a.version AS applied'
+    ' FROM corrections c'
+    ' LEFT JOIN participants p ON p.id = c.participant_id AND p.competition_id = :competition_id'
+    ' LEFT JOIN applied a ON a.participant_id = c.participant_id'
+)
+
+
+async def correct_results_from_db(
+        complex_id: int, corrections: list[ResultCorrection], session: AsyncSession
 ):
-    complexes_result = session.scalars(
-        select(Results)
-        .where(Results.complex_id==complex_id)
-    ).all()
+    """
+    Insert or correct many results of one complex in one statement.
+
+    A correction applies only if ``version`` is still the stored one (None
+    for a new result), so two judges fixing the same athlete cannot
+    overwrite each other: the slower one gets ``conflict`` with the current
+    result to re-check, a version for a result that was never stored or is
+    gone gets ``conflict`` with none. Nothing is locked beyond the rows being written.
+    Returns one item per input in the same order.
+    """
+    competition_id = await session.scalar(
+        select(Complexes.competition_id).where(Complexes.id == complex_id)
+    )
+    if competition_id is None:
+        raise ComplexNotFound(f'Complex with ID: {complex_id} not found')
+
+    items, unique = [], {}
+    for correction in corrections:
+        if correction.participant_id in unique:
+            items.append({'participant_id': correction.participant_id, 'status': CorrectionStatus.duplicate})
+            continue
+        unique[correction.participant_id] = correction
+        items.append(None)
+    if not unique:
+        return items
+
+    scores = [score_result(correction.view, correction.result) for correction in unique.values()]
+    rows = (await session.execute(CORRECT_RESULTS, {
+        'complex_id': complex_id, 'competition_id': competition_id,
+        'participant_ids': list(unique),
+        'views': [correction.view.value for correction in unique.values()],
+        'results': [correction.result for correction in unique.values()],
+        'scores': [score for score, _ in scores],
+        'tiebreaks': [tiebreak for _, tiebreak in scores],
+        'versions': [correction.version for correction in unique.values()],
+    })).all()
+    applied = [row.participant_id for row in rows if row.applied is not None]
+    conflicted = [row.participant_id for row in rows if row.found and row.applied is None]
+    current = {}
+    if conflicted:
+        # a new statement sees what the version check lost against: the statement above
+        # still read the rows as they were before it waited on the other judge's lock
+        current = {
+            row.participant_id: row for row in await session.execute(
+                select(Results.participant_id, Results.version, Results.view, Results.result)
+                .where(Results.complex_id == complex_id, Results.participant_id.in_(conflicted))
+            )
+        }
+    if applied:
+        await notify_leaderboard_change(session, competition_id, complex_id)
+        await publish_live_event(session, 'correction', competition_id, complex_id, participant_ids=applied)
+    await session.commit()
+    if applied:
+        leaderboard_cache.invalidate(competition_id, complex_id)
+
+    reports = {}
+    for row in rows:
+        if not row.found:
+            reports[row.participant_id] = {'participant_id': row.participant_id, 'status': CorrectionStatus.not_found}
+        elif row.applied is not None:
+            reports[row.participant_id] = {
+                'participant_id': row.participant_id, 'status': CorrectionStatus.applied, 'version': row.applied
+            }
+        else:
+            latest = current.get(row.participant_id)
+            reports[row.participant_id] = {
+                'participant_id': row.participant_id, 'status': CorrectionStatus.conflict,
+                'version': latest.version if latest is not None else None,
+                'current': {'view': latest.view, 'result': latest.result} if latest is not None else None,
+            }
+    return [
+        item if item is not None else reports[participant_id]
+        for item, participant_id in zip(items, (correction.participant_id for correction in corrections))
+    ]
+
+
+def result_sort_key(order: ResultOrder):
+    if order == ResultOrder.rank:
+        # served by ix_results_complex_id_score
+        return Results.score, Results.tiebreak, Results.participant_id
+    return Results.participant_id,
+
+
+async def get_all_result_complexes_from_db(
+    complex_id: int, session: AsyncSession,
+    order: ResultOrder = ResultOrder.participant, page: Page | None = None
+):
+    query = select(Results).where(Results.complex_id==complex_id)
+    if page is not None:
+        query = page.keyset(query, *result_sort_key(order))
+    else:
+        query = query.order_by(*result_sort_key(order))
+
+    complexes_result = (await session.scalars(query)).all()
 
     return complexes_result
\ No newline at end of file
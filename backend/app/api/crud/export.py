@@ -0,0 +1,90 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from sqlalchemy import Select, String, case, cast, func, select, true
+
+from ...db.database import read_session
+from ...db.models import Complexes, Contributions, Mode, Participants, Payments, Results
+
+
+# rows fetched from the server-side cursor and written out per chunk
+EXPORT_BATCH = 1000
+
+PARTICIPANTS_HEADER = (
+    'participant_id', 'fullname', 'email', 'is_qualified', 'is_arrived', 'payment_status', 'paid', 'paid_at'
+)
+RESULTS_HEADER = (
+    'complex_id', 'complex', 'place', 'participant_id', 'fullname', 'view', 'result'
+)
+
+
+def participants_export_query(competition_id: int) -> Select:
+    # a lateral lookup per athlete keeps the plan an ordered index scan, so rows stream right away
+    paid = (
+        select(
+            case(
+                (func.bool_or(Payments.mode == Mode.full), Mode.full.value),
+                (func.count(Payments.mode) > 0, Mode.partial.value),
+                else_='unpaid',
+            ).label('payment_status'),
+            func.coalesce(func.sum(Contributions.price), 0).label('paid'),
+            func.max(Payments.pay_datetime).label('paid_at'),
+        )
+        .select_from(Payments)
+        .join(Contributions, (Contributions.competition_id == Payments.competition_id)
+              & (Contributions.mode == Payments.mode))
+        .where(Payments.participant_id == Participants.id)
+        .lateral('paid')
+    )
+    return (
+        select(
+            Participants.id, Participants.fullname, Participants.email,
+            Participants.is_qualified, Participants.is_arrived,
+            paid.c.payment_status, paid.c.paid, paid.c.paid_at,
+        )
+        .join(paid, true())
+        .where(Participants.competition_id == competition_id)
+        .order_by(Participants.id)
+    )
+
+
+def results_export_query(competition_id: int) -> Select:
+    place = func.rank().over(partition_by=Results.complex_id, order_by=(Results.score, Results.tiebreak))
+    return (
+        select(
+            Results.complex_id, Complexes.name, place, Results.participant_id, Participants.fullname,
+            cast(Results.view, String), Results.result,
+        )
+        .join(Complexes, Complexes.id == Results.complex_id)
+        # the competition filter keeps the join to its own athletes instead of hashing all of them
+        .join(Participants, (Participants.id == Results.participant_id)
+              & (Participants.competition_id == competition_id))
+        .where(Complexes.competition_id == competition_id)
+        .order_by(Results.complex_id, Results.score, Results.tiebreak, Results.participant_id)
+    )
+
+
+async def stream_csv(query: Select, header: tuple[str, ...]) -> AsyncIterator[str]:
+    """
+    CSV of ``query`` chunk by chunk through a server-side cursor.
+
+    The session is the generator's own, on a replica when one is healthy:
+    the request's one is closed before a streaming response starts sending.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(header)
+    yield flush()
+    async with read_session() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH))
+        async for rows in result.partitions():
+            writer.writerows(rows)
+            yield flush()
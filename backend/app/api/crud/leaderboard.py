@@ -0,0 +1,185 @@
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from ...core.cache import TTLCache, SortedStandings
+from ...core.config import settings
+from ...core.metrics import register_cache
+from ...core.scoring import rank, placement_matrix, standings
+from ...db.models import Complexes, Participants, Results
+from ...db.notify import listener, notify, is_local
+
+
+LEADERBOARD_CHANNEL = 'leaderboard'
+
+
+class LeaderboardCache:
+    """
+    Standings keyed by (competition_id, complex_id).
+
+    Complex boards are SortedStandings updated in place on every result write,
+    overall standings are stored under (competition_id, None) and dropped on
+    any write in the competition. ``generation`` moves on every change so a
+    read that raced with a write does not store what it loaded.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.boards = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self._competitions: dict[int, int] = {}
+
+    def get_complex(self, complex_id: int) -> SortedStandings | None:
+        competition_id = self._competitions.get(complex_id)
+        return self.boards.get((competition_id, complex_id))
+
+    def set_complex(
+            self, competition_id: int, complex_id: int, board: SortedStandings, generation: int
+    ) -> None:
+        if generation == self.generation:
+            self._competitions[complex_id] = competition_id
+            self.boards.set((competition_id, complex_id), board)
+
+    def get_competition(self, competition_id: int) -> dict | None:
+        return self.boards.get((competition_id, None))
+
+    def set_competition(self, competition_id: int, leaderboard: dict, generation: int) -> None:
+        if generation == self.generation:
+            self.boards.set((competition_id, None), leaderboard)
+
+    def upsert(self, competition_id: int, row: dict) -> None:
+        self.generation += 1
+        self.boards.pop((competition_id, None))
+        board = self.boards.get((competition_id, row['complex_id']), count=False)
+        if board is not None:
+            board.upsert(row)
+
+    def invalidate(self, competition_id: int, complex_id: int | None = None) -> None:
+        self.generation += 1
+        if complex_id is None:
+            self.boards.pop_where(lambda key: key[0] == competition_id)
+        else:
+            self.boards.pop((competition_id, complex_id))
+            self.boards.pop((competition_id, None))
+
+    def clear(self) -> None:
+        self.generation += 1
+        self.boards.clear()
+
+
+leaderboard_cache = LeaderboardCache(
+    maxsize=settings.LEADERBOARD_CACHE_SIZE, ttl=settings.LEADERBOARD_CACHE_TTL
+)
+register_cache('leaderboard', leaderboard_cache.boards)
+
+
+def _on_leaderboard_change(payload: dict | None):
+    # other workers changed results; this worker's own writes are applied in place
+    if payload is None:
+        leaderboard_cache.clear()
+    elif not is_local(payload):
+        leaderboard_cache.invalidate(payload['competition_id'], payload.get('complex_id'))
+
+
+listener.subscribe(LEADERBOARD_CHANNEL, _on_leaderboard_change)
+
+
+async def notify_leaderboard_change(
+        session: AsyncSession, competition_id: int, complex_id: int | None = None
+):
+    await notify(
+        session, LEADERBOARD_CHANNEL,
+        {'competition_id': competition_id, 'complex_id': complex_id}
+    )
+
+
+def update_cached_leaderboard(competition_id: int, row: dict):
+    leaderboard_cache.upsert(competition_id, row)
+
+
+def _score_rows(rows) -> tuple[np.ndarray, np.ndarray]:
+    scores = np.array([row.score for row in rows], dtype=np.float64)
+    tiebreaks = np.array([row.tiebreak for row in rows], dtype=np.float64)
+    return scores, tiebreaks
+
+
+async def get_complex_leaderboard_from_db(
+        complex_id: int, session: AsyncSession
+):
+    board = leaderboard_cache.get_complex(complex_id)
+    if board is None:
+        generation = leaderboard_cache.generation
+        competition_id = await session.scalar(
+            select(Complexes.competition_id).where(Complexes.id == complex_id)
+        )
+        rows = (await session.execute(
+            select(
+                Results.complex_id, Results.participant_id, Results.view,
+                Results.result, Participants.fullname, Results.score, Results.tiebreak
+            )
+            # the competition filter lets the join read ix_participants_competition_id
+            .join(Participants, (Participants.id == Results.participant_id)
+                  & (Participants.competition_id == competition_id))
+            .where(Results.complex_id == complex_id)
+        )).all()
+        board = SortedStandings([dict(row._mapping) for row in rows])
+        if competition_id is not None:
+            leaderboard_cache.set_complex(competition_id, complex_id, board, generation)
+
+    return {'complex_id': complex_id, 'standings': board.ranked()}
+
+
+async def get_competition_leaderboard_from_db(
+        competition_id: int, session: AsyncSession
+):
+    leaderboard = leaderboard_cache.get_competition(competition_id)
+    if leaderboard is not None:
+        return leaderboard
+
+    generation = leaderboard_cache.generation
+    participants = (await session.execute(
+        select(Participants.id, Participants.fullname)
+        .where(Participants.competition_id == competition_id)
+        .order_by(Participants.id)
+    )).all()
+    complex_ids = np.array((await session.scalars(
+        select(Complexes.id)
+        .where(Complexes.competition_id == competition_id)
+        .order_by(Complexes.id)
+    )).all(), dtype=np.int64)
+    rows = (await session.execute(
+        select(Results.complex_id, Results.participant_id, Results.score, Results.tiebreak)
+        .join(Complexes, Complexes.id == Results.complex_id)
+        .join(Participants, Participants.id == Results.participant_id)
+        .where(
+            Complexes.competition_id == competition_id,
+            Participants.competition_id == competition_id
+        )
+    )).all()
+
+    participant_ids = np.array([row.id for row in participants], dtype=np.int64)
+    result_complexes = np.array([row.complex_id for row in rows], dtype=np.int64)
+    result_participants = np.array([row.participant_id for row in rows], dtype=np.int64)
+    scores, tiebreaks = _score_rows(rows)
+
+    complex_places = rank(result_complexes, scores, tiebreaks)
+    matrix = placement_matrix(
+        participant_ids, complex_ids, result_participants, result_complexes, complex_places
+    )
+    points, places = standings(matrix)
+
+    standing = [
+        {
+            'participant_id': participants[index].id,
+            'fullname': participants[index].fullname,
+            'points': int(points[index]),
+            'place': int(places[index]),
+            'places': dict(zip(complex_ids.tolist(), matrix[index].tolist())),
+        }
+        for index in np.argsort(places, kind='stable')
+    ]
+    leaderboard = {
+        'competition_id': competition_id,
+        'complexes': complex_ids.tolist(),
+        'standings': standing,
+    }
+    leaderboard_cache.set_competition(competition_id, leaderboard, generation)
+    return leaderboard
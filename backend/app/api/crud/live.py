@@ -0,0 +1,47 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...core.broadcast import Broadcaster
+from ...core.config import settings
+from ...core.metrics import registry, Gauge
+from ...db.notify import listener, notify
+
+
+LIVE_CHANNEL = 'live'
+
+broadcaster = Broadcaster(max_subscribers=settings.LIVE_MAX_SUBSCRIBERS)
+
+
+def competition_topic(competition_id: int) -> tuple:
+    return 'competition', competition_id
+
+
+def complex_topic(complex_id: int) -> tuple:
+    return 'complex', complex_id
+
+
+def _on_live_event(payload: dict | None):
+    # every worker, the publishing one included, fans out from the notification
+    if payload is None:
+        broadcaster.publish_all({'type': 'resync'})
+        return
+    payload.pop('origin', None)
+    broadcaster.publish(competition_topic(payload['competition_id']), payload)
+    if payload.get('complex_id') is not None:
+        broadcaster.publish(complex_topic(payload['complex_id']), payload)
+
+
+listener.subscribe(LIVE_CHANNEL, _on_live_event)
+
+registry.register(Gauge('live_subscribers', 'Connected live result streams.', lambda: broadcaster.subscribers))
+registry.register(Gauge(
+    'live_dropped_total', 'Live streams closed because the client fell behind.',
+    lambda: broadcaster.dropped, type='counter'
+))
+
+
+async def publish_live_event(
+        session: AsyncSession, type: str, competition_id: int, complex_id: int | None = None, **data
+):
+    """ Sent to subscribers once the session commits, keep it small (NOTIFY caps payloads at 8000 bytes) """
+    await notify(session, LIVE_CHANNEL, {
+        'type': type, 'competition_id': competition_id, 'complex_id': complex_id, **data
+    })
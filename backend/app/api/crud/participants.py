@@ -1,11 +1,21 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, insert, delete
-from ..schemas.participants import ParticipantsCreate, QualificationCreate
-from ...db.models import Participants, Payments, Mode, QualifyingVideos
+from sqlalchemy.ext.asyncio import AsyncSession
+import datetime
 
+from sqlalchemy import select, insert, update, delete, func, cast, literal, false, or_, text, String, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..schemas.participants import (
+    ParticipantsCreate, QualificationCreate, RegistrationStatus, CheckIn, CheckInStatus
+)
+from ...core.config import settings
+from ...core.security import read_checkin_token
+from ..dependencies.pagination import Page
+from ...db.models import Participants, Payments, Mode, QualifyingVideos, Complexes, QualifierStatus
+from .live import publish_live_event
 
-def register_participant_for_qualifying(
-        competition_id: int, participant_data: ParticipantsCreate, session: Session
+
+async def register_participant_for_qualifying(
+        competition_id: int, participant_data: ParticipantsCreate, session: AsyncSession
 ):
     participant = Participants(
         competition_id=competition_id, **participant_data.dict()
@@ -13,31 +23,360 @@ def register_participant_for_qualifying(
     session.add(participant)
     payment = Payments(mode=Mode.partial.value, competition_id=competition_id)
     participant.payment.append(payment)
-    session.commit()
-    session.refresh(participant)
+    await session.commit()
+    await session.refresh(participant)
     return participant
 
 
-def get_all_participants_from_db(
-    competition_id: int, session: Session
+async def register_participants_batch_from_db(
+        competition_id: int, participants_data: list[ParticipantsCreate], session: AsyncSession
 ):
-    participants = session.scalars(
+    """
+    Register many participants with a single INSERT ... SELECT unnest(...)
+    ON CONFLICT DO NOTHING RETURNING, then insert all their partial payments
+    with a second set-based statement.
+
+    Returns one item per input in the same order: created, conflict (the
+    email is already registered) or duplicate (repeated in this batch).
+    """
+    items = []
+    unique = {}
+    for participant_data in participants_data:
+        if participant_data.email in unique:
+            items.append({'email': participant_data.email, 'status': RegistrationStatus.duplicate})
+            continue
+        unique[participant_data.email] = participant_data
+        items.append({'email': participant_data.email, 'status': RegistrationStatus.conflict})
+    if not unique:
+        return items
+
+    participants = (await session.scalars(
+        pg_insert(Participants)
+        .from_select(
+            ['competition_id', 'fullname', 'email', 'is_qualified', 'is_arrived'],
+            select(
+                literal(competition_id),
+                func.unnest(cast([data.fullname for data in unique.values()], ARRAY(String))),
+                func.unnest(cast(list(unique), ARRAY(String))),
+                false(),
+                false(),
+            )
+        )
+        .on_conflict_do_nothing(index_elements=[Participants.email])
+        .returning(Participants)
+    )).all()
+    if participants:
+        await session.execute(
+            insert(Payments)
+            .from_select(
+                ['participant_id', 'competition_id', 'mode', 'pay_datetime'],
+                select(
+                    func.unnest(cast([participant.id for participant in participants], ARRAY(Integer))),
+                    literal(competition_id),
+                    literal(Mode.partial.value),
+                    func.now(),
+                )
+            )
+        )
+    created = {participant.email: participant for participant in participants}
+
+    await session.commit()
+
+    for item in items:
+        participant = created.pop(item['email'], None)
+        if participant is not None:
+            item.update(status=RegistrationStatus.created, participant=participant)
+    return items
+
+
+CHECK_IN = text(
+    'WITH scans AS ('
+    '  SELECT * FROM unnest(CAST(:participant_ids AS integer[]), CAST(:emails AS varchar[]))'
+    '    WITH ORDINALITY AS s(participant_id, email, position)'
+    '), prev AS ('
+    # the state before this statement: UPDATE ... RETURNING only sees the new one
+    '  SELECT s.position, p.id, p.fullname, p.is_arrived,'
+    '    row_number() OVER (PARTITION BY p.id ORDER BY s.position) AS scan'
+    '  FROM scans s'
+    '  LEFT JOIN LATERAL ('
+    '    SELECT id, fullname, is_arrived FROM participants'
+    '    WHERE competition_id = :competition_id AND (id = s.participant_id OR email = s.email)'
+    '    LIMIT 1'
+    '  ) p ON true'
+    '), arrived AS ('
+    '  UPDATE participants p SET is_arrived = true'
+    '  FROM prev WHERE p.id = prev.id AND prev.scan = 1 AND NOT p.is_arrived'
+    '  RETURNING p.id'
+    ')'
+    'SELECT prev.position, prev.id, prev.fullname, prev.scan = 1 AND arrived.id IS NOT NULL AS arrived'
+    ' FROM prev LEFT JOIN arrived ON arrived.id = prev.id'
+    ' ORDER BY prev.position'
+)
+
+
+async def check_in_participants_from_db(
+        competition_id: int, checkins: list[CheckIn], session: AsyncSession
+):
+    """
+    Mark the scanned athletes as arrived with one statement per batch.
+
+    Replaying a scan is harmless: an athlete is reported ``arrived`` by the
+    one scan that flipped the flag, every other scan of them (earlier desks,
+    a replayed offline queue, a repeat in the same batch) gets
+    ``already_arrived``. Results are in the order of ``checkins``.
+    """
+    participant_ids, emails, items = [], [], []
+    for checkin in checkins:
+        participant_id = checkin.participant_id
+        if checkin.token is not None:
+            claims = read_checkin_token(checkin.token)
+            if claims is None:
+                items.append({'status': CheckInStatus.invalid_token})
+                participant_ids.append(None)
+                emails.append(None)
+                continue
+            # a token of another competition simply matches nobody here
+            participant_id = claims[0] if claims[1] == competition_id else None
+        participant_ids.append(participant_id)
+        emails.append(checkin.email)
+        items.append(None)
+    if not checkins:
+        return items
+
+    rows = (await session.execute(CHECK_IN, {
+        'competition_id': competition_id, 'participant_ids': participant_ids, 'emails': emails
+    })).all()
+    await session.commit()
+
+    for row in rows:
+        if items[row.position - 1] is not None:
+            continue
+        if row.id is None:
+            status = CheckInStatus.not_found
+        else:
+            status = CheckInStatus.arrived if row.arrived else CheckInStatus.already_arrived
+        items[row.position - 1] = {'participant_id': row.id, 'fullname': row.fullname, 'status': status}
+    return items
+
+
+async def get_participant_from_db(competition_id: int, participant_id: int, session: AsyncSession):
+    return await session.scalar(
         select(Participants)
-        .where(Participants.competition_id==competition_id)
-    ).all()
+        .where(Participants.id == participant_id, Participants.competition_id == competition_id)
+    )
+
+
+async def get_all_participants_from_db(
+    competition_id: int, session: AsyncSession, page: Page | None = None,
+    is_qualified: bool | None = None, is_arrived: bool | None = None
+):
+    query = select(Participants).where(Participants.competition_id==competition_id)
+    if is_qualified is not None:
+        query = query.where(Participants.is_qualified==is_qualified)
+    if is_arrived is not None:
+        query = query.where(Participants.is_arrived==is_arrived)
+    if page is not None:
+        query = page.keyset(query, Participants.id)
+
+    participants = (await session.scalars(query)).all()
 
     return participants
 
 
-def create_qualification_video_from_db(
+async def create_qualification_video_from_db(
     complex_id: int, participant_id: int,
-    qualifying_data: QualificationCreate, session: Session
+    qualifying_data: QualificationCreate, session: AsyncSession
 ):
     qualifying_video = QualifyingVideos(
         complex_id=complex_id, participant_id=participant_id,
         **qualifying_data.dict()
     )
     session.add(qualifying_video)
-    session.commit()
-    session.refresh(qualifying_video)
-    return qualifying_video
\ No newline at end of file
+    await session.flush()
+    competition_id = await session.scalar(
+        select(Complexes.competition_id).where(Complexes.id == complex_id)
+    )
+    if competition_id is not None:
+        await publish_live_event(
+            session, 'qualifying', competition_id, complex_id, participant_id=participant_id,
+            qualifier_status=qualifying_video.qualifier_status
+        )
+    await session.commit()
+    await session.refresh(qualifying_video)
+    return qualifying_video
+
+
+class LeaseLost(Exception):
+    pass
+
+
+async def lease_qualification_video_from_db(
+        owner: str, session: AsyncSession, competition_id: int | None = None, complex_id: int | None = None
+):
+    """
+    Hand the next unreviewed video to ``owner`` until the lease expires.
+
+    Rows other judges are claiming right now are skipped instead of waited
+    on, so concurrent claims never block each other or get the same video.
+    A judge asking again gets their own unexpired lease back first.
+    """
+    now = func.now()
+    candidate = (
+        select(QualifyingVideos.complex_id, QualifyingVideos.participant_id)
+        .where(
+            QualifyingVideos.reviewed_at.is_(None),
+            or_(
+                QualifyingVideos.lease_expires_at.is_(None),
+                QualifyingVideos.lease_expires_at < now,
+                QualifyingVideos.lease_owner == owner,
+            )
+        )
+        .order_by(
+            # the judge's own lease first, so asking again never hands out a second video
+            func.coalesce(QualifyingVideos.lease_owner == owner, False).desc(),
+            QualifyingVideos.complex_id, QualifyingVideos.participant_id
+        )
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if complex_id is not None:
+        candidate = candidate.where(QualifyingVideos.complex_id == complex_id)
+    if competition_id is not None:
+        candidate = candidate.where(QualifyingVideos.complex_id.in_(
+            select(Complexes.id).where(Complexes.competition_id == competition_id, Complexes.is_qualifying)
+        ))
+    candidate = candidate.cte('candidate')
+
+    video = await session.scalar(
+        update(QualifyingVideos)
+        .where(
+            QualifyingVideos.complex_id == candidate.c.complex_id,
+            QualifyingVideos.participant_id == candidate.c.participant_id,
+        )
+        .values(
+            lease_owner=owner,
+            lease_expires_at=now + datetime.timedelta(seconds=settings.QUALIFYING_LEASE_SECONDS),
+        )
+        .returning(QualifyingVideos)
+        .execution_options(populate_existing=True)
+    )
+    await session.commit()
+    return video
+
+
+async def review_qualification_video_from_db(
+        complex_id: int, participant_id: int, owner: str,
+        qualifier_status: QualifierStatus, session: AsyncSession
+):
+    """
+    Record the verdict of the judge holding the lease.
+
+    An expired lease still counts until another judge claims the video;
+    after that the verdict is refused with :class:`LeaseLost`.
+    """
+    video = await session.scalar(
+        update(QualifyingVideos)
+        .where(
+            QualifyingVideos.complex_id == complex_id,
+            QualifyingVideos.participant_id == participant_id,
+            QualifyingVideos.lease_owner == owner,
+            QualifyingVideos.reviewed_at.is_(None),
+        )
+        .values(qualifier_status=qualifier_status, reviewed_at=func.now(), lease_expires_at=None)
+        .returning(QualifyingVideos)
+        .execution_options(populate_existing=True)
+    )
+    if video is None:
+        await session.rollback()
+        raise LeaseLost(f'Video of participant {participant_id} in complex {complex_id} is not leased to {owner}')
+    competition_id = await session.scalar(
+        select(Complexes.competition_id).where(Complexes.id == complex_id)
+    )
+    await publish_live_event(
+        session, 'qualifying', competition_id, complex_id, participant_id=participant_id,
+        qualifier_status=video.qualifier_status
+    )
+    await session.commit()
+    return video
+
+QUALIFICATION_CUT = text(
+    'WITH qualifying AS ('
+    '  SELECT id FROM complexes WHERE competition_id = :competition_id AND is_qualifying'
+    '), entrants AS ('
+    '  SELECT id FROM participants WHERE competition_id = :competition_id'
+    '), places AS ('
+    '  SELECT r.participant_id, r.complex_id,'
+    '    rank() OVER (PARTITION BY r.complex_id ORDER BY r.score, r.tiebreak) AS place'
+    '  FROM results r'
+    '  JOIN qualifying q ON q.id = r.complex_id'
+    '  JOIN entrants e ON e.id = r.participant_id'
+    '), standings AS ('
+    # a missing result counts as the place after the last possible one
+    '  SELECT e.id AS participant_id, count(p.place) AS results,'
+    '    CAST(sum(coalesce(p.place, n.total)) AS integer) AS points, min(coalesce(p.place, n.total)) AS best'
+    '  FROM entrants e'
+    '  CROSS JOIN qualifying q'
+    '  CROSS JOIN (SELECT count(*) AS total FROM entrants) n'
+    '  LEFT JOIN places p ON p.participant_id = e.id AND p.complex_id = q.id'
+    '  GROUP BY e.id'
+    '), ranked AS ('
+    '  SELECT participant_id, points, results, rank() OVER (ORDER BY points, best) AS place'
+    '  FROM standings'
+    '), cut AS ('
+    '  SELECT ranked.*, results > 0 AND place <= coalesce('
+    '    CAST(:top AS integer),'
+    '    ceil(count(*) OVER () * CAST(:percentile AS double precision) / 100)'
+    '  ) AS qualified'
+    '  FROM ranked'
+    '), participants_updated AS ('
+    '  UPDATE participants p SET is_qualified = cut.qualified'
+    # the competition filter lets the update read its entrants by index instead of every athlete
+    '  FROM cut WHERE p.id = cut.participant_id AND p.competition_id = :competition_id'
+    '    AND p.is_qualified <> cut.qualified'
+    '  RETURNING p.id'
+    '), videos_updated AS ('
+    '  UPDATE qualifying_videos v SET qualifier_status = CAST('
+    "    CASE WHEN cut.qualified THEN 'qualified' ELSE 'unqualified' END AS qualifierstatus"
+    '  )'
+    '  FROM cut, qualifying q'
+    '  WHERE v.participant_id = cut.participant_id AND v.complex_id = q.id'
+    "    AND (v.qualifier_status = 'qualified') <> cut.qualified"
+    '  RETURNING v.participant_id'
+    ')'
+    'SELECT cut.participant_id, cut.points, cut.place, cut.qualified,'
+    '  (SELECT count(*) FROM participants_updated) AS participants_changed,'
+    '  (SELECT count(*) FROM videos_updated) AS videos_changed'
+    ' FROM cut ORDER BY cut.place, cut.participant_id'
+)
+
+
+async def qualify_participants_from_db(
+        competition_id: int, session: AsyncSession, top: int | None = None, percentile: float | None = None
+):
+    """
+    Rank the entrants over every qualifying complex and set ``is_qualified``
+    and ``qualifier_status`` for all of them in one statement.
+
+    Points are the sum of the places (a missing result counts as last),
+    ties are broken by the best single place. The cut keeps places up to
+    ``top``, or up to ``percentile`` percent of the entrants; ties on the
+    cut line all qualify, athletes without any result never do.
+    """
+    rows = (await session.execute(
+        QUALIFICATION_CUT, {'competition_id': competition_id, 'top': top, 'percentile': percentile}
+    )).all()
+    qualified = sum(row.qualified for row in rows)
+    await publish_live_event(session, 'qualification', competition_id, qualified=qualified)
+    await session.commit()
+
+    return {
+        'competition_id': competition_id,
+        'entrants': len(rows),
+        'qualified': qualified,
+        'participants_changed': rows[0].participants_changed if rows else 0,
+        'videos_changed': rows[0].videos_changed if rows else 0,
+        'standings': [
+            {'participant_id': row.participant_id, 'points': row.points, 'place': row.place, 'qualified': row.qualified}
+            for row in rows
+        ],
+    }
@@ -0,0 +1,133 @@
+import asyncio
+import datetime
+import uuid
+
+from sqlalchemy import text
+
+from ..schemas.competitions import PurgeStatus
+from ...core.config import settings
+from ...db.database import async_session
+from ...db.models import Competitions
+from .competitions import delete_competition_from_db
+from ..log import Logger
+
+
+log = Logger(__name__, 'app/base.log').logger
+
+
+# an array of ids makes an index condition; with IN the planner hash joins a whole table per chunk
+IN_COMPLEXES = 'complex_id = ANY(ARRAY(SELECT id FROM complexes WHERE competition_id = :competition_id))'
+# leaves first, so every chunk only touches its own table
+PURGE_STEPS = (
+    ('results', IN_COMPLEXES),
+    ('qualifying_videos', IN_COMPLEXES),
+    ('payments', 'competition_id = :competition_id'),
+    ('participants', 'competition_id = :competition_id'),
+    ('complexes', 'competition_id = :competition_id'),
+    ('contributions', 'competition_id = :competition_id'),
+)
+
+
+def purge_chunk(table: str, where: str):
+    """ Deletes up to :chunk rows of ``table`` matching ``where`` """
+    return text(
+        f'DELETE FROM {table} WHERE ctid = ANY(ARRAY('
+        f'SELECT ctid FROM {table} WHERE {where} LIMIT :chunk'
+        f'))'
+    )
+
+
+class PurgeJob:
+    """ Progress of a chunked deletion of one competition """
+
+    def __init__(self, competition_id: int) -> None:
+        self.id = uuid.uuid4().hex
+        self.competition_id = competition_id
+        self.status = PurgeStatus.running
+        self.total: dict[str, int] = {}
+        self.deleted: dict[str, int] = {}
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_at: datetime.datetime | None = None
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def progress(self) -> float:
+        total = sum(self.total.values())
+        if self.status is PurgeStatus.done:
+            return 1.0
+        return sum(self.deleted.values()) / total if total else 0.0
+
+
+# jobs of this worker by id; finished ones are kept for polling up to PURGE_JOBS_KEPT
+purge_jobs: dict[str, PurgeJob] = {}
+
+
+async def run_purge_job(job: PurgeJob) -> None:
+    params = {'competition_id': job.competition_id, 'chunk': settings.PURGE_CHUNK_SIZE}
+    try:
+        async with async_session() as session:
+            for table, where in PURGE_STEPS:
+                job.total[table] = await session.scalar(
+                    text(f'SELECT count(*) FROM {table} WHERE {where}'), params
+                )
+                job.deleted[table] = 0
+
+        for table, where in PURGE_STEPS:
+            chunk = purge_chunk(table, where)
+            while True:
+                # a short transaction per chunk keeps row locks brief
+                async with async_session() as session:
+                    deleted = (await session.execute(chunk, params)).rowcount
+                    await session.commit()
+                job.deleted[table] += deleted
+                if deleted < settings.PURGE_CHUNK_SIZE:
+                    break
+
+        async with async_session() as session:
+            competition = await session.get(Competitions, job.competition_id)
+            if competition is not None:
+                await delete_competition_from_db(current_competition=competition, session=session)
+        job.status = PurgeStatus.done
+    except asyncio.CancelledError:
+        # the chunk in flight is rolled back, what was committed stays deleted
+        log.warning('Purge of competition %s interrupted', job.competition_id)
+        job.status = PurgeStatus.failed
+        job.error = 'Interrupted by shutdown, delete the competition again to resume'
+        raise
+    except Exception as exc:
+        log.exception('Purge of competition %s failed', job.competition_id)
+        job.status = PurgeStatus.failed
+        job.error = str(exc)
+    finally:
+        job.finished_at = datetime.datetime.now(datetime.timezone.utc)
+        job.task = None
+
+
+def start_purge_job(competition_id: int) -> PurgeJob:
+    """
+    Delete the competition chunk by chunk in the background; one job per
+    competition at a time. The competition row goes last, so a job that
+    was interrupted is resumed by starting another one: it counts and
+    deletes only what is left.
+    """
+    for job in purge_jobs.values():
+        if job.competition_id == competition_id and job.status is PurgeStatus.running:
+            return job
+
+    finished = [job_id for job_id, job in purge_jobs.items() if job.status is not PurgeStatus.running]
+    for job_id in finished[:max(len(finished) - settings.PURGE_JOBS_KEPT + 1, 0)]:
+        del purge_jobs[job_id]
+
+    job = PurgeJob(competition_id)
+    purge_jobs[job.id] = job
+    job.task = asyncio.create_task(run_purge_job(job))
+    return job
+
+
+async def stop_purge_jobs() -> None:
+    """ Cancel the running jobs of this worker and wait for their chunks to roll back """
+    tasks = [job.task for job in purge_jobs.values() if job.task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,165 @@
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas.competitions import ImportFormat
+from ...core.scoring import parse_result
+from ...db.bulk import copy_records
+from ...db.models import Complexes, ViewResult
+from .leaderboard import notify_leaderboard_change, leaderboard_cache
+from .live import publish_live_event
+from ..log import Logger
+
+log = Logger(__name__, 'app/base.log').logger
+
+
+IMPORT_CHUNK_SIZE = 5000
+STAGING_TABLE = 'results_import'
+STAGING_COLUMNS = ('line', 'participant_id', 'email', 'view', 'result', 'score', 'tiebreak')
+# staged into integer and varchar(255) columns, a row that does not fit would fail the whole COPY
+MAX_ID = 2 ** 31 - 1
+MAX_TEXT = 255
+
+
+class ComplexNotFound(Exception):
+    pass
+
+
+def read_import_rows(stream: TextIO, format: ImportFormat) -> Iterator[tuple[int, dict | str]]:
+    """
+    (line number, row) pairs from a CSV file with a header or from JSON lines.
+
+    A line that can not be decoded is yielded as its error message.
+    """
+    if format == ImportFormat.csv:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            yield line, f'invalid JSON: {exc.msg}'
+            continue
+        yield line, row if isinstance(row, dict) else 'expected a JSON object'
+
+
+def parse_participant_id(value) -> int:
+    # bools and floats would silently turn into another athlete
+    if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        digits = value.strip()
+        # no need to parse thousands of digits only to find them out of range
+        number = int(digits) if len(digits) <= len(str(MAX_ID)) else None
+    elif type(value) is int:
+        number = value
+    else:
+        raise ValueError(f'participant_id is not an integer: {value!r}')
+    if number is None or not 0 < number <= MAX_ID:
+        raise ValueError(f'participant_id is out of range: {str(value)[:20]}')
+    return number
+
+
+def validate_import_row(row: dict) -> tuple:
+    """ Staging record for one row, raises ValueError with a readable reason """
+    participant_id = row.get('participant_id')
+    email = str(row.get('email') or '').strip() or None
+    if participant_id not in (None, ''):
+        participant_id = parse_participant_id(participant_id)
+    else:
+        participant_id = None
+    if participant_id is None and email is None:
+        raise ValueError('participant_id or email is required')
+    if email is not None and len(email) > MAX_TEXT:
+        raise ValueError(f'email is longer than {MAX_TEXT} characters')
+
+    try:
+        view = ViewResult(str(row.get('view') or '').strip())
+    except ValueError:
+        raise ValueError(f"view must be one of {', '.join(v.value for v in ViewResult)}")
+    result = str(row.get('result') or '').strip()
+    if not result:
+        raise ValueError('result is required')
+    if len(result) > MAX_TEXT:
+        raise ValueError(f'result is longer than {MAX_TEXT} characters')
+    score, tiebreak = parse_result(view, result)
+
+    return participant_id, email, view.value, result, score, tiebreak
+
+
+async def import_results_from_db(
+        complex_id: int, rows: Iterable[tuple[int, dict | str]], session: AsyncSession
+):
+    """
+    Load results for one complex: rows are validated in chunks, COPY'ed into
+    a temporary staging table and merged into ``results`` in one statement.
+    Later lines win over earlier ones for the same participant.
+    """
+    competition_id = await session.scalar(
+        select(Complexes.competition_id).where(Complexes.id == complex_id)
+    )
+    if competition_id is None:
+        raise ComplexNotFound(f'Complex with ID: {complex_id} not found')
+
+    await session.execute(text(
+        f'CREATE TEMPORARY TABLE {STAGING_TABLE} ('
+        'line integer, participant_id integer, email varchar(255), view text, '
+        'result varchar(255), score double precision, tiebreak double precision'
+        ') ON COMMIT DROP'
+    ))
+
+    errors = []
+    rows = iter(rows)
+    while chunk := list(islice(rows, IMPORT_CHUNK_SIZE)):
+        records = []
+        for line, row in chunk:
+            if isinstance(row, str):
+                errors.append({'line': line, 'error': row})
+                continue
+            try:
+                records.append((line, *validate_import_row(row)))
+            except ValueError as exc:
+                errors.append({'line': line, 'error': str(exc)})
+        await copy_records(session, STAGING_TABLE, STAGING_COLUMNS, records)
+
+    parameters = {'competition_id': competition_id, 'complex_id': complex_id}
+    await session.execute(text(
+        f'UPDATE {STAGING_TABLE} s SET participant_id = p.id '
+        'FROM participants p '
+        'WHERE s.participant_id IS NULL AND p.email = s.email AND p.competition_id = :competition_id'
+    ), parameters)
+    unresolved = await session.execute(text(
+        f'SELECT s.line, coalesce(s.participant_id::text, s.email) AS participant FROM {STAGING_TABLE} s '
+        'WHERE NOT EXISTS ('
+        '  SELECT 1 FROM participants p WHERE p.id = s.participant_id AND p.competition_id = :competition_id'
+        ')'
+    ), parameters)
+    errors.extend(
+        {'line': row.line, 'error': f'participant {row.participant} not found in this competition'}
+        for row in unresolved
+    )
+    imported = await session.execute(text(
+        'INSERT INTO results (complex_id, participant_id, view, result, score, tiebreak) '
+        'SELECT DISTINCT ON (s.participant_id) '
+        '  :complex_id, s.participant_id, s.view::viewresult, s.result, s.score, s.tiebreak '
+        f'FROM {STAGING_TABLE} s '
+        'JOIN participants p ON p.id = s.participant_id AND p.competition_id = :competition_id '
+        'ORDER BY s.participant_id, s.line DESC '
+        'ON CONFLICT (complex_id, participant_id) DO UPDATE SET '
+        '  view = excluded.view, result = excluded.result, '
+        '  score = excluded.score, tiebreak = excluded.tiebreak, version = results.version + 1'
+    ), parameters)
+
+    await notify_leaderboard_change(session, competition_id, complex_id)
+    # too many rows for one notification, subscribers reload the complex
+    await publish_live_event(session, 'import', competition_id, complex_id, imported=imported.rowcount)
+    await session.commit()
+    leaderboard_cache.invalidate(competition_id, complex_id)
+
+    errors.sort(key=lambda error: error['line'])
+    return {'complex_id': complex_id, 'imported': imported.rowcount, 'errors': errors}
@@ -1,11 +1,12 @@
 from fastapi import HTTPException, status, Depends
 from pydantic import ValidationError
-from ..schemas.auth import TokenPayload
-from ...core.security import verify_password, settings
+import time
+from ..schemas.auth import TokenPayload, UserRead
+from ...core.security import password_hasher, settings
 from sqlalchemy.exc import NoResultFound
-from ..crud.auth import get_user_from_db, Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..crud.auth import get_user_from_db, user_cache
 from ...db.database import SessionDep
-from ...db.models import Users
 from jose import JWTError, jwt
 from typing import Annotated
 from fastapi.security import OAuth2PasswordBearer
@@ -19,45 +20,63 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 TokenDep = Annotated[str, Depends(oauth2_scheme)]
 
 
-def identify_user(
-        username: str, session: Session
+async def identify_user(
+        username: str, session: AsyncSession
 ):
-    user = get_user_from_db(
+    user = await get_user_from_db(
         username=username, session=session
     )
     return user
 
 
 
-def authenticate_user(
-        username: str, password: str, session: Session
+async def authenticate_user(
+        username: str, password: str, session: AsyncSession
 ):
-    user = identify_user(username, session)
-    if not user or not verify_password(password, user.password):
+    user = await identify_user(username, session)
+    if not user or not await password_hasher.verify(password, user.password):
         return False
 
     return user
 
 
-def get_current_user(
+async def get_current_user(
         token: TokenDep, session: SessionDep
 ):
     try:
         payload = jwt.decode(
             token, settings.TOKEN_SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        token_data = TokenPayload(sub=payload.get('sub'))
+        token_data = TokenPayload(**payload)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail='Could not validate credentials'
         )
-    user = identify_user(token_data.sub, session)
-    if not user:
+    if settings.TOKEN_EMBED_PRINCIPAL and token_data.uid is not None and token_data.su is not None:
+        return UserRead(id=token_data.uid, username=token_data.sub, is_superuser=token_data.su)
+
+    user = user_cache.get(token_data.sub)
+    if user is None:
+        db_user = await identify_user(token_data.sub, session)
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+        user = UserRead.model_validate(db_user)
+        # never outlive the token that vouched for it
+        ttl = token_data.exp - time.time() if token_data.exp else None
+        user_cache.set(token_data.sub, user, ttl=ttl)
+    return user
+
+
+def get_current_superuser(current_user: Annotated[UserRead, Depends(get_current_user)]):
+    if not current_user.is_superuser:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges"
         )
-    return user
+    return current_user
 
-CurrentUser = Annotated[Users, Depends(get_current_user)]
+CurrentUser = Annotated[UserRead, Depends(get_current_user)]
+CurrentSuperUser = Annotated[UserRead, Depends(get_current_superuser)]
 CurrentUserDepends = Depends(get_current_user)
 
@@ -9,7 +9,7 @@ async def get_current_competition(
         competition_id: int, session: SessionDep
 ):
     try:
-        competition = session.get_one(Competitions, competition_id)
+        competition = await session.get_one(Competitions, competition_id)
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,83 @@
+import base64
+import binascii
+import enum
+import json
+from typing import Annotated, Any, Callable, Sequence
+from fastapi import Depends, HTTPException, Query, Response, status
+from sqlalchemy import Select, tuple_
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list) or not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid pagination cursor'
+        )
+    return values
+
+
+def cursor_value(value: Any, column) -> Any:
+    """ ``value`` as the Python type of ``column``, None when it can not be one """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, bool) or value is None:
+        return None
+    if python_type is float and isinstance(value, (int, float)):
+        return float(value)
+    if issubclass(python_type, enum.Enum):
+        try:
+            return python_type(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, python_type) else None
+
+
+class Page:
+    """ ?after=<opaque cursor>&limit= of a keyset-paginated list """
+
+    def __init__(
+            self,
+            after: Annotated[str | None, Query(description='X-Next-Cursor of the previous page')] = None,
+            limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.after = decode_cursor(after) if after else None
+        self.limit = limit
+
+    def keyset(self, query: Select, *columns) -> Select:
+        """ Rows after the cursor in (columns) order, one extra to detect a next page """
+        if self.after is not None:
+            # the values are bound as is, one of another type would only fail in the database
+            values = [cursor_value(value, column) for value, column in zip(self.after, columns)]
+            if len(self.after) != len(columns) or None in values:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail='Pagination cursor does not match this ordering'
+                )
+            query = query.where(tuple_(*columns) > tuple_(*values))
+        return query.order_by(*columns).limit(self.limit + 1)
+
+    def paginate(self, response: Response, rows: Sequence, key: Callable[[Any], Sequence]) -> Sequence:
+        """ Trim the extra row and announce the next cursor in a header """
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+        return rows
+
+
+PageDep = Annotated[Page, Depends()]
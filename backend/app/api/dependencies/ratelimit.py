@@ -0,0 +1,72 @@
+import math
+from typing import Annotated
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from .auth import TokenDep
+from ...core.ratelimit import parse_limit, take
+from ...core.security import read_token_subject
+
+
+# Each factory returns a dependency for ``include_router(dependencies=...)``
+# or a route's ``dependencies``; ``group`` names the bucket family, so the
+# same caller has separate budgets on separate groups.
+
+
+def too_many_requests(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail='Too many requests',
+        headers={'Retry-After': str(max(math.ceil(wait), 1))},
+    )
+
+
+def client_ip(request: Request) -> str:
+    # behind a proxy uvicorn --proxy-headers puts X-Forwarded-For here
+    return request.client.host if request.client else 'unknown'
+
+
+def limit_ip(group: str, limit: str):
+    """ Per client IP, checked before anything else of the request runs """
+    rate_limit = parse_limit(limit)
+
+    async def check_ip(request: Request):
+        wait = await take(group, f'ip:{client_ip(request)}', rate_limit)
+        if wait:
+            raise too_many_requests(wait)
+
+    return Depends(check_ip)
+
+
+def limit_username(group: str, limit: str):
+    """
+    Per username posted to the login form from one client IP. Keyed by the
+    username alone, anybody could lock the owner out of their account.
+    """
+    rate_limit = parse_limit(limit)
+
+    async def check_username(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+        wait = await take(group, f'username:{form_data.username}:ip:{client_ip(request)}', rate_limit)
+        if wait:
+            raise too_many_requests(wait)
+
+    return Depends(check_username)
+
+
+def limit_user(group: str, limit: str, methods: tuple[str, ...] | None = None):
+    """
+    Per access token subject, optionally only for some methods (writes).
+    Only the token is read, so the limit applies before the user is loaded;
+    an invalid token is let through to be refused by get_current_user.
+    """
+    rate_limit = parse_limit(limit)
+
+    async def check_user(request: Request, token: TokenDep):
+        if methods is not None and request.method not in methods:
+            return
+        subject = read_token_subject(token)
+        if subject is None:
+            return
+        wait = await take(group, f'sub:{subject}', rate_limit)
+        if wait:
+            raise too_many_requests(wait)
+
+    return Depends(check_user)
@@ -1,40 +1,90 @@
 from fastapi import APIRouter
 from .dependencies.auth import CurrentUserDepends
+from .dependencies.ratelimit import limit_ip, limit_user
+from ..core.config import settings
 from .routes.participants import participant_router, qualifying_router
 from .routes.auth import auth_router, user_router
+from .routes.metrics import metrics_router
+from .routes.live import live_router
 from .routes.competitions import (
-    competition_router, contribution_router, complex_router, result_router
+    competition_router, contribution_router, complex_router, result_router,
+    leaderboard_router
 )
 
 api_router = APIRouter()
 
-api_router.include_router(auth_router)
+# every login attempt costs a bcrypt verification, so addresses are limited before it
+api_router.include_router(
+    auth_router,
+    dependencies=[limit_ip('login', settings.RATE_LIMIT_LOGIN_IP)]
+)
+# scraped by Prometheus without a token
+api_router.include_router(metrics_router)
 
+# the user limits read the token's subject only, so they run before the user is looked up
 api_router.include_router(
     user_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('users', settings.RATE_LIMIT_USER),
+        limit_user('user-create', settings.RATE_LIMIT_USER_CREATE, methods=('POST',)),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     competition_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('competitions', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     contribution_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('contributions', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     complex_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('complexes', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     participant_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('participants', settings.RATE_LIMIT_USER),
+        limit_user('registration', settings.RATE_LIMIT_REGISTRATION, methods=('POST',)),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     qualifying_router,
-    dependencies=[CurrentUserDepends]
+    dependencies=[
+        limit_user('qualifying', settings.RATE_LIMIT_USER),
+        limit_user('qualifying-submission', settings.RATE_LIMIT_QUALIFYING, methods=('POST',)),
+        CurrentUserDepends
+    ]
 )
 api_router.include_router(
     result_router,
-    dependencies=[CurrentUserDepends]
-)
\ No newline at end of file
+    dependencies=[
+        limit_user('results', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
+)
+api_router.include_router(
+    leaderboard_router,
+    dependencies=[
+        limit_user('leaderboards', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
+)
+api_router.include_router(
+    live_router,
+    dependencies=[
+        limit_user('live', settings.RATE_LIMIT_USER),
+        CurrentUserDepends
+    ]
+)
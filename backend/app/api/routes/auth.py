@@ -2,10 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from ...db.database import SessionDep
 from sqlalchemy.exc import IntegrityError
 from typing import Annotated
-from ..dependencies.auth import authenticate_user, CurrentUser
+from ..dependencies.auth import authenticate_user, CurrentUser, CurrentSuperUser
+from ..dependencies.ratelimit import limit_username
 from ..schemas.auth import Token, UserCreate, UserRead
-from ..crud.auth import create_user_from_db
-from ...core.security import create_access_token
+from ..crud.auth import create_user_from_db, user_cache
+from ...core.security import create_access_token, settings, password_hasher, HashingOverloaded
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import JWTError, jwt
 from ..log import Logger
@@ -26,20 +27,35 @@ user_router = APIRouter(
 FormLoginDep = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
-@auth_router.post('/token')
+def hashing_overloaded(exc: HashingOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc),
+        headers={"Retry-After": "1"},
+    )
+
+
+@auth_router.post(
+    '/token', dependencies=[limit_username('login-username', settings.RATE_LIMIT_LOGIN_USERNAME)]
+)
 async def login(
         form_data: FormLoginDep, session:SessionDep
 )-> Token:
-    user = authenticate_user(
-        username=form_data.username, password=form_data.password, session=session
-    )
+    try:
+        user = await authenticate_user(
+            username=form_data.username, password=form_data.password, session=session
+        )
+    except HashingOverloaded as exc:
+        raise hashing_overloaded(exc)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token({'sub': user.username})
+    claims = {'sub': user.username}
+    if settings.TOKEN_EMBED_PRINCIPAL:
+        claims.update(uid=user.id, su=user.is_superuser)
+    access_token = create_access_token(claims)
     return Token(access_token=access_token, token_type="bearer")
 
 
@@ -48,8 +64,12 @@ async def create_user(
         user_in: UserCreate, session: SessionDep
 ):
     try:
-        user = create_user_from_db(
-            user_in=user_in, session=session
+        password = await password_hasher.hash(user_in.password)
+    except HashingOverloaded as exc:
+        raise hashing_overloaded(exc)
+    try:
+        user = await create_user_from_db(
+            user_in=user_in.model_copy(update={'password': password}), session=session
         )
     except IntegrityError as exc:
         raise HTTPException(
@@ -60,4 +80,9 @@ async def create_user(
 
 @user_router.get("/me", response_model=UserRead)
 async def get_users(current_user: CurrentUser):
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+@user_router.get("/cache")
+async def get_user_cache_stats(current_user: CurrentSuperUser):
+    return user_cache.stats()
\ No newline at end of file
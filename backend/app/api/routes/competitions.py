@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
+import hashlib
+import io
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Query, UploadFile, Response, Request
+from fastapi.responses import StreamingResponse
 from typing import Annotated
 from ..dependencies.competition import CurrentCompetition
-from sqlalchemy.orm import Session
+from ..dependencies.pagination import PageDep
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from ..log import Logger
 from ..schemas.competitions import (
     CompetitionCreate, CompetitionReadWithJoin, CompetitionRead, CompetitionUpdate, ContributionRead, ContributionUpdate,
-    ContributionCreate, ComplexesCreate, ComplexesRead, ComplexesUpdate, ResultsCreate, ResultsRead
+    ContributionCreate, ComplexesCreate, ComplexesRead, ComplexesUpdate, ResultsCreate, ResultsRead,
+    ComplexLeaderboard, CompetitionLeaderboard, ResultOrder, ImportFormat, ResultsImportReport,
+    CompetitionSnapshot, PurgeJobRead, ResultCorrection, ResultCorrectionItem
 )
-from ...db.database import SessionDep
+from ...db.database import SessionDep, ReadSessionDep, SnapshotSessionDep
 from ...db.models import Mode
 from ..crud.competitions import (
     create_competition_from_db, get_competition_from_db, get_all_competition_from_db, update_competition_from_db,
     delete_competition_from_db, create_contribution_from_db, get_contributions_from_db, update_contribution_from_db,
     delete_contribution_from_db, get_all_complexes_from_db, create_result_complex_from_db, get_all_result_complexes_from_db,
-    create_complex_from_db
+    create_complex_from_db, result_sort_key, get_competition_snapshot_from_db, get_competition_version_from_db,
+    correct_results_from_db
+)
+from ..crud.leaderboard import get_complex_leaderboard_from_db, get_competition_leaderboard_from_db
+from ..crud.results_import import import_results_from_db, read_import_rows, ComplexNotFound
+from ..crud.purge import start_purge_job, purge_jobs
+from ..crud.export import (
+    stream_csv, participants_export_query, results_export_query, PARTICIPANTS_HEADER, RESULTS_HEADER
 )
 
 
@@ -34,6 +46,10 @@ result_router = APIRouter(
     prefix='/results',
     tags=['Results']
 )
+leaderboard_router = APIRouter(
+    prefix='/leaderboard',
+    tags=['Leaderboard']
+)
 
 log = Logger(__name__, 'app/base.log').logger
 
@@ -47,7 +63,7 @@ async def create_competition(
         competition_in: CompetitionCreate, session: SessionDep
 ):
     try:
-        competition = create_competition_from_db(
+        competition = await create_competition_from_db(
             competition=competition_in, session=session
         )
     except IntegrityError as exc:
@@ -58,17 +74,19 @@ async def create_competition(
 
 
 @competition_router.get('/', response_model=list[CompetitionRead])
-async def get_all_competitions(session: SessionDep):
-    competitions = get_all_competition_from_db(session=session)
-    return competitions
+async def get_all_competitions(
+        session: ReadSessionDep, page: PageDep, response: Response
+):
+    competitions = await get_all_competition_from_db(session=session, page=page)
+    return page.paginate(response, competitions, lambda competition: (competition.id,))
 
 
 @competition_router.get('/{competition_id}', response_model=CompetitionReadWithJoin)
 async def get_competition(
-        competition_id: Annotated[int, Path(ge=1)], session: SessionDep
+        competition_id: Annotated[int, Path(ge=1)], session: ReadSessionDep
 ):
     try:
-        competition = get_competition_from_db(
+        competition = await get_competition_from_db(
             competition_id=competition_id, session=session
         )
     except NoResultFound as exc:
@@ -78,12 +96,56 @@ async def get_competition(
     return competition
 
 
+@competition_router.get('/{competition_id}/snapshot', response_model=CompetitionSnapshot)
+async def get_competition_snapshot(
+        competition_id: Annotated[int, Path(ge=1)], session: SnapshotSessionDep,
+        request: Request, response: Response
+):
+    # the version probe and the load must see the same data
+    version = await get_competition_version_from_db(competition_id=competition_id, session=session)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f'Competition with ID: {competition_id} not found'
+        )
+    etag = '"{}"'.format(hashlib.blake2b(version.encode(), digest_size=16).hexdigest())
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in {tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    competition = await get_competition_snapshot_from_db(competition_id=competition_id, session=session)
+    response.headers.update(headers)
+    return competition
+
+
+def csv_response(rows, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        rows, media_type='text/csv; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@competition_router.get('/{competition_id}/export/participants')
+async def export_participants(current_competition: CurrentCompetition):
+    return csv_response(
+        stream_csv(participants_export_query(current_competition.id), PARTICIPANTS_HEADER),
+        f'competition-{current_competition.id}-participants.csv'
+    )
+
+
+@competition_router.get('/{competition_id}/export/results')
+async def export_results(current_competition: CurrentCompetition):
+    return csv_response(
+        stream_csv(results_export_query(current_competition.id), RESULTS_HEADER),
+        f'competition-{current_competition.id}-results.csv'
+    )
+
+
 @competition_router.put('/{competition_id}', response_model=CompetitionRead)
 async def update_competition(
         current_competition: CurrentCompetition, updated_competition_data: CompetitionUpdate,
         session: SessionDep
 ):
-    competition = update_competition_from_db(
+    competition = await update_competition_from_db(
         current_competition=current_competition, updated_competition_data=updated_competition_data,
         session=session
     )
@@ -92,9 +154,14 @@ async def update_competition(
 
 @competition_router.delete('/')
 async def delete_competition(
-        current_competition: CurrentCompetition, session: SessionDep
+        current_competition: CurrentCompetition, session: SessionDep, response: Response,
+        background: bool = False
 ):
-    competition = delete_competition_from_db(
+    if background:
+        job = start_purge_job(current_competition.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return PurgeJobRead.model_validate(job)
+    competition = await delete_competition_from_db(
         current_competition=current_competition, session=session
     )
     if competition:
@@ -102,6 +169,16 @@ async def delete_competition(
                 'message': f'Competition deleted {current_competition.id}'}
 
 
+@competition_router.get('/purge/{job_id}', response_model=PurgeJobRead)
+async def get_purge_job(job_id: str):
+    job = purge_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f'Purge job {job_id} not found'
+        )
+    return job
+
+
 
 
 @contribution_router.post('/', response_model=ContributionRead)
@@ -110,7 +187,7 @@ async def create_contribution(
         session: SessionDep
 ):
         try:
-            contribution = create_contribution_from_db(
+            contribution = await create_contribution_from_db(
                 competition_id=competition_id, contribution=contribution_in,
                 session=session,
             )
@@ -123,17 +200,17 @@ async def create_contribution(
 
 @contribution_router.get('/', response_model=list[ContributionRead])
 async def get_contribution(
-        competition_id: CompetitionId, session: SessionDep
+        competition_id: CompetitionId, session: ReadSessionDep, page: PageDep, response: Response
 ):
-    contribution = get_contributions_from_db(
-        competition_id=competition_id, session=session
+    contribution = await get_contributions_from_db(
+        competition_id=competition_id, session=session, page=page
     )
-    if not contribution:
+    if not contribution and page.after is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Contribution with competition_id {competition_id} not found"
         )
-    return contribution
+    return page.paginate(response, contribution, lambda contribution: (contribution.mode,))
 
 
 @contribution_router.put('/', response_model=ContributionRead)
@@ -142,7 +219,7 @@ async def update_contribution(
         contribution_in: ContributionUpdate, session: SessionDep,
 ):
     try:
-        contribution = update_contribution_from_db(
+        contribution = await update_contribution_from_db(
             competition_id=competition_id, contribution_mode=contribution_mode,
             contribution_in=contribution_in, session=session
         )
@@ -158,7 +235,7 @@ async def delete_contribution(
         competition_id: CompetitionId,contribution_mode: Mode, session: SessionDep
 ):
     try:
-        delete_contribution_from_db(
+        await delete_contribution_from_db(
             competition_id=competition_id, contribution_mode=contribution_mode,
             session=session
         )
@@ -175,7 +252,7 @@ async def create_complex(
         competition_id: CompetitionId, complex_data: ComplexesCreate, session: SessionDep
 ):
     try:
-        complex = create_complex_from_db(
+        complex = await create_complex_from_db(
             competition_id=competition_id, complex_data=complex_data, session=session
         )
     except IntegrityError as exc:
@@ -187,17 +264,19 @@ async def create_complex(
 
 @complex_router.get('/', response_model=list[ComplexesRead])
 async def get_all_complexes(
-    competition_id: CompetitionId, session:SessionDep
+    competition_id: CompetitionId, session: ReadSessionDep, page: PageDep, response: Response,
+    is_qualifying: bool | None = None
 ):
     try:
-        complexes = get_all_complexes_from_db(
-            competition_id=competition_id, session=session
+        complexes = await get_all_complexes_from_db(
+            competition_id=competition_id, session=session, page=page,
+            is_qualifying=is_qualifying
         )
     except IntegrityError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc.orig)
         )
-    return complexes
+    return page.paginate(response, complexes, lambda complex: (complex.id,))
 
 
 @result_router.post('/', response_model=ResultsRead)
@@ -206,7 +285,7 @@ async def create_result_complex(
     result_data: ResultsCreate ,session: SessionDep
 ):
     try:
-        result_complex = create_result_complex_from_db(
+        result_complex = await create_result_complex_from_db(
             complex_id=complex_id, participant_id=participant_id,
             result_data=result_data, session=session
         )
@@ -217,16 +296,81 @@ async def create_result_complex(
     return result_complex
 
 
+@result_router.put('/', response_model=list[ResultCorrectionItem])
+async def correct_result_complexes(
+    complex_id: ComplexId, corrections: list[ResultCorrection], session: SessionDep
+):
+    try:
+        report = await correct_results_from_db(
+            complex_id=complex_id, corrections=corrections, session=session
+        )
+    except ComplexNotFound as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)
+        )
+    return report
+
+
+@result_router.post('/import', response_model=ResultsImportReport)
+async def import_result_complexes(
+    complex_id: ComplexId, file: UploadFile, session: SessionDep,
+    format: ImportFormat | None = None
+):
+    if format is None:
+        is_jsonl = (file.filename or '').endswith(('.jsonl', '.ndjson'))
+        format = ImportFormat.jsonl if is_jsonl else ImportFormat.csv
+    stream = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+    try:
+        report = await import_results_from_db(
+            complex_id=complex_id, rows=read_import_rows(stream, format), session=session
+        )
+    except ComplexNotFound as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)
+        )
+    except UnicodeDecodeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        )
+    return report
+
+
 @result_router.get('/', response_model=list[ResultsRead])
 async def get_all_result_complexes(
-    complex_id: ComplexId, session: SessionDep
+    complex_id: ComplexId, session: ReadSessionDep, page: PageDep, response: Response,
+    order: ResultOrder = ResultOrder.participant
 ):
     try:
-        complexes = get_all_result_complexes_from_db(
-            complex_id=complex_id, session=session
+        complexes = await get_all_result_complexes_from_db(
+            complex_id=complex_id, session=session, order=order, page=page
         )
     except IntegrityError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc.orig)
         )
-    return complexes
\ No newline at end of file
+    columns = [column.key for column in result_sort_key(order)]
+    return page.paginate(
+        response, complexes, lambda result: [getattr(result, column) for column in columns]
+    )
+
+
+# leaderboards stay on the primary: a miss right after an invalidation would
+# otherwise cache what a lagging replica has not replayed yet
+@leaderboard_router.get('/', response_model=CompetitionLeaderboard)
+async def get_competition_leaderboard(
+    competition_id: CompetitionId, session: SessionDep
+):
+    leaderboard = await get_competition_leaderboard_from_db(
+        competition_id=competition_id, session=session
+    )
+    return leaderboard
+
+
+@leaderboard_router.get('/complexes', response_model=ComplexLeaderboard)
+async def get_complex_leaderboard(
+    complex_id: ComplexId, session: SessionDep
+):
+    leaderboard = await get_complex_leaderboard_from_db(
+        complex_id=complex_id, session=session
+    )
+    return leaderboard
\ No newline at end of file
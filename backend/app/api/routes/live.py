@@ -0,0 +1,65 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from ...core.config import settings
+from ..crud.live import broadcaster, competition_topic, complex_topic
+from .competitions import CompetitionId, ComplexId
+
+
+live_router = APIRouter(
+    prefix='/live',
+    tags=['Live']
+)
+
+
+def format_event(event: str, data: dict) -> str:
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+async def live_events(topic: tuple):
+    # subscribed only once the body is sent: a response that never starts must not hold a slot,
+    # and the client disconnecting cancels this generator, which closes the subscription
+    subscription = broadcaster.subscribe(topic, maxsize=settings.LIVE_QUEUE_SIZE)
+    if subscription is None:
+        # filled up since the route checked, the browser reconnects after the retry delay
+        yield 'retry: 5000\n\n'
+        return
+    async with subscription:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                message = await subscription.get(timeout=settings.LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                if subscription.overflowed:
+                    yield format_event('overflow', {'type': 'overflow'})
+                return
+            yield format_event(message['type'], message)
+
+
+@live_router.get('/results')
+async def stream_results(
+        competition_id: CompetitionId | None = None, complex_id: ComplexId | None = None
+):
+    """
+    Server-sent events with the results and qualifying updates of a
+    competition or of one complex. After ``resync`` or ``overflow``
+    events may have been missed and the client should reload.
+    """
+    if (competition_id is None) == (complex_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Pass either competition_id or complex_id'
+        )
+    topic = competition_topic(competition_id) if complex_id is None else complex_topic(complex_id)
+    if broadcaster.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Too many live subscribers',
+            headers={'Retry-After': '5'}
+        )
+    return StreamingResponse(
+        live_events(topic), media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ...core.metrics import registry
+
+
+metrics_router = APIRouter(
+    tags=['Metrics']
+)
+
+
+@metrics_router.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Response, Body
 from sqlalchemy.exc import IntegrityError
-from ..schemas.participants import ParticipantsRead, ParticipantsCreate, QualificationCreate
-from ...db.database import SessionDep
+from ..schemas.participants import (
+    ParticipantsRead, ParticipantsCreate, QualificationCreate, ParticipantsBatchItem, QualificationReport,
+    QualificationRead, QualificationLease, QualificationReview, CheckIn, CheckInResult, CheckInToken
+)
+from ...core.config import settings
+from ...core.security import create_checkin_token
+
+from ...db.database import SessionDep, ReadSessionDep
+from ..dependencies.pagination import PageDep
+from ..dependencies.auth import CurrentUser
 from typing import Annotated
 from ..crud.participants import (
-    register_participant_for_qualifying, get_all_participants_from_db, create_qualification_video_from_db
+    register_participant_for_qualifying, get_all_participants_from_db, create_qualification_video_from_db,
+    register_participants_batch_from_db, qualify_participants_from_db, lease_qualification_video_from_db,
+    review_qualification_video_from_db, LeaseLost, check_in_participants_from_db, get_participant_from_db
 )
 
 
@@ -27,7 +37,7 @@ async def register_participant_for_qualifying_stage(
      competition_id: CompetitionId, participant_data: ParticipantsCreate, session: SessionDep
 ):
     try:
-        participant = register_participant_for_qualifying(
+        participant = await register_participant_for_qualifying(
             competition_id=competition_id, participant_data=participant_data, session=session
         )
     except IntegrityError as exc:
@@ -36,19 +46,70 @@ async def register_participant_for_qualifying_stage(
         )
     return participant
 
+@participant_router.post("/batch", response_model=list[ParticipantsBatchItem])
+async def register_participants_batch(
+     competition_id: CompetitionId, participants_data: list[ParticipantsCreate], session: SessionDep
+):
+    try:
+        participants = await register_participants_batch_from_db(
+            competition_id=competition_id, participants_data=participants_data, session=session
+        )
+    except IntegrityError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc.orig)
+        )
+    return participants
+
+
 @participant_router.get('/', response_model=list[ParticipantsRead])
 async def get_all_participants(
-        competition_id: CompetitionId, session:SessionDep
+        competition_id: CompetitionId, session: ReadSessionDep, page: PageDep, response: Response,
+        is_qualified: bool | None = None, is_arrived: bool | None = None
 ):
     try:
-        participants = get_all_participants_from_db(
-            competition_id=competition_id, session=session
+        participants = await get_all_participants_from_db(
+            competition_id=competition_id, session=session, page=page,
+            is_qualified=is_qualified, is_arrived=is_arrived
         )
     except IntegrityError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc.orig)
         )
-    return participants
+    return page.paginate(response, participants, lambda participant: (participant.id,))
+
+@participant_router.post('/checkin', response_model=CheckInResult)
+async def check_in_participant(
+     competition_id: CompetitionId, checkin: CheckIn, session: SessionDep
+):
+    [result] = await check_in_participants_from_db(
+        competition_id=competition_id, checkins=[checkin], session=session
+    )
+    return result
+
+
+@participant_router.post('/checkin/batch', response_model=list[CheckInResult])
+async def check_in_participants_batch(
+     competition_id: CompetitionId, session: SessionDep,
+     checkins: Annotated[list[CheckIn], Body(max_length=settings.CHECKIN_BATCH_LIMIT)]
+):
+    return await check_in_participants_from_db(
+        competition_id=competition_id, checkins=checkins, session=session
+    )
+
+
+@participant_router.get('/checkin/token', response_model=CheckInToken)
+async def get_check_in_token(
+     competition_id: CompetitionId, participant_id: ParticipantId, session: ReadSessionDep
+):
+    participant = await get_participant_from_db(
+        competition_id=competition_id, participant_id=participant_id, session=session
+    )
+    if participant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail='Participant not found'
+        )
+    return {'participant_id': participant.id, 'token': create_checkin_token(participant.id, competition_id)}
+
 
 @qualifying_router.post('/')
 async def create_participant_qualification_video(
@@ -56,7 +117,7 @@ async def create_participant_qualification_video(
    qualifying_data: QualificationCreate, session: SessionDep
 ):
     try:
-        qualification_result = create_qualification_video_from_db(
+        qualification_result = await create_qualification_video_from_db(
             complex_id=complex_id, participant_id=participant_id,
             qualifying_data=qualifying_data, session=session
         )
@@ -64,4 +125,50 @@ async def create_participant_qualification_video(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc.orig)
         )
-    return qualification_result
\ No newline at end of file
+    return qualification_result
+
+
+@qualifying_router.post('/cut', response_model=QualificationReport)
+async def cut_qualified_participants(
+   competition_id: CompetitionId, session: SessionDep,
+   top: Annotated[int | None, Query(ge=1)] = None,
+   percentile: Annotated[float | None, Query(gt=0, le=100)] = None
+):
+    if (top is None) == (percentile is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Pass exactly one of top or percentile'
+        )
+    return await qualify_participants_from_db(
+        competition_id=competition_id, session=session, top=top, percentile=percentile
+    )
+
+
+@qualifying_router.get('/next', response_model=QualificationLease, responses={204: {'description': 'Nothing to review'}})
+async def lease_next_qualification_video(
+   session: SessionDep, user: CurrentUser,
+   competition_id: Annotated[int | None, Query(ge=1)] = None,
+   complex_id: Annotated[int | None, Query(ge=1)] = None
+):
+    video = await lease_qualification_video_from_db(
+        owner=user.username, session=session, competition_id=competition_id, complex_id=complex_id
+    )
+    if video is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return video
+
+
+@qualifying_router.post('/review', response_model=QualificationRead)
+async def review_qualification_video(
+   complex_id: ComplexId, participant_id: ParticipantId,
+   review: QualificationReview, session: SessionDep, user: CurrentUser
+):
+    try:
+        video = await review_qualification_video_from_db(
+            complex_id=complex_id, participant_id=participant_id, owner=user.username,
+            qualifier_status=review.qualifier_status, session=session
+        )
+    except LeaseLost as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=str(exc)
+        )
+    return video
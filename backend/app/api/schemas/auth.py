@@ -1,10 +1,4 @@
 from pydantic import BaseModel, ConfigDict
-from pydantic.functional_validators import AfterValidator
-from typing_extensions import Annotated
-from ...core.security import get_password_hash
-
-
-HashPassword = Annotated[str, AfterValidator(get_password_hash)]
 
 
 class Token(BaseModel):
@@ -14,6 +8,9 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: str | None = None
+    exp: int | None = None
+    uid: int | None = None
+    su: bool | None = None
 
 
 class UserBase(BaseModel):
@@ -22,7 +19,8 @@ class UserBase(BaseModel):
 
 
 class UserCreate(UserBase):
-    password: HashPassword
+    # plain text here, hashed off the event loop by the route
+    password: str
 
 
 class UserRead(UserBase):
@@ -1,8 +1,10 @@
 import datetime
+import enum
 from pydantic import BaseModel, ConfigDict
 from ..log import Logger
 import sys
 from ...db.models import Mode, ViewResult
+from .participants import ParticipantsRead
 from datetime import time
 
 
@@ -84,6 +86,11 @@ class ComplexesRead(ComplexesUpdate):
     competition_id: int
 
 
+class ResultOrder(str, enum.Enum):
+    participant = 'participant'
+    rank = 'rank'
+
+
 class ResultsBase(BaseModel):
     view: ViewResult
     result: str
@@ -98,4 +105,97 @@ class ResultsRead(ResultsBase):
     model_config = ConfigDict(from_attributes=True)
 
     complex_id: int
-    participant_id: int
\ No newline at end of file
+    participant_id: int
+    version: int
+
+
+class ResultCorrection(ResultsBase):
+    participant_id: int
+    # the version the judge corrected, None for a result that does not exist yet
+    version: int | None = None
+
+
+class CorrectionStatus(str, enum.Enum):
+    applied = 'applied'
+    conflict = 'conflict'
+    not_found = 'not_found'
+    duplicate = 'duplicate'
+
+
+class ResultCorrectionItem(BaseModel):
+    participant_id: int
+    status: CorrectionStatus
+    # the new version when applied, the one to re-read on a conflict
+    version: int | None = None
+    current: ResultsBase | None = None
+
+
+class ComplexSnapshot(ComplexesRead):
+    result: list[ResultsRead] = []
+
+
+class CompetitionSnapshot(CompetitionReadWithJoin):
+    complex: list[ComplexSnapshot] = []
+    participant: list[ParticipantsRead] = []
+
+
+class ComplexStanding(ResultsRead):
+    fullname: str
+    place: int
+
+
+class ComplexLeaderboard(BaseModel):
+    complex_id: int
+    standings: list[ComplexStanding]
+
+
+class CompetitionStanding(BaseModel):
+    participant_id: int
+    fullname: str
+    points: int
+    place: int
+    places: dict[int, int]
+
+
+class CompetitionLeaderboard(BaseModel):
+    competition_id: int
+    complexes: list[int]
+    standings: list[CompetitionStanding]
+
+
+
+class ImportFormat(str, enum.Enum):
+    csv = 'csv'
+    jsonl = 'jsonl'
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ResultsImportReport(BaseModel):
+    complex_id: int
+    imported: int
+    errors: list[ImportRowError]
+
+
+class PurgeStatus(str, enum.Enum):
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
+class PurgeJobRead(BaseModel):
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    competition_id: int
+    status: PurgeStatus
+    total: dict[str, int]
+    deleted: dict[str, int]
+    progress: float
+    started_at: datetime.datetime
+    finished_at: datetime.datetime | None = None
+    error: str | None = None
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+import datetime
+import enum
+from pydantic import BaseModel, ConfigDict, model_validator
 from ...db.models import QualifierStatus
 
 class ParticipantsBase(BaseModel):
@@ -24,6 +26,49 @@ class ParticipantsRead(ParticipantsBase):
     is_arrived: bool
 
 
+class RegistrationStatus(str, enum.Enum):
+    created = 'created'
+    conflict = 'conflict'
+    duplicate = 'duplicate'
+
+
+class ParticipantsBatchItem(BaseModel):
+    email: str
+    status: RegistrationStatus
+    participant: ParticipantsRead | None = None
+
+
+class CheckIn(BaseModel):
+    """ One scan at a desk: exactly one of the ways to name the athlete """
+    participant_id: int | None = None
+    email: str | None = None
+    token: str | None = None
+
+    @model_validator(mode='after')
+    def one_key(self):
+        if sum(value is not None for value in (self.participant_id, self.email, self.token)) != 1:
+            raise ValueError('Pass exactly one of participant_id, email or token')
+        return self
+
+
+class CheckInStatus(str, enum.Enum):
+    arrived = 'arrived'
+    already_arrived = 'already_arrived'
+    not_found = 'not_found'
+    invalid_token = 'invalid_token'
+
+
+class CheckInResult(BaseModel):
+    participant_id: int | None = None
+    fullname: str | None = None
+    status: CheckInStatus
+
+
+class CheckInToken(BaseModel):
+    participant_id: int
+    token: str
+
+
 class QualificationBase(BaseModel):
     video_url: str
 
@@ -40,3 +85,27 @@ class QualificationRead(QualificationBase):
     qualifier_status: QualifierStatus
 
 
+class QualificationLease(QualificationRead):
+    participant_id: int
+    lease_owner: str
+    lease_expires_at: datetime.datetime
+
+
+class QualificationReview(BaseModel):
+    qualifier_status: QualifierStatus
+
+
+class QualificationStanding(BaseModel):
+    participant_id: int
+    points: int
+    place: int
+    qualified: bool
+
+
+class QualificationReport(BaseModel):
+    competition_id: int
+    entrants: int
+    qualified: int
+    participants_changed: int
+    videos_changed: int
+    standings: list[QualificationStanding]
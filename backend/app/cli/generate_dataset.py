@@ -0,0 +1,214 @@
+"""
+Generate a synthetic competition dataset for benchmarks and capacity planning.
+
+The same --seed and scale always produce the same rows. Every table is
+filled with COPY in one transaction, ids are drawn from the tables' own
+sequences so the data can live next to real competitions.
+
+    python -m app.cli.generate_dataset --seed 7 --competitions 2 --scale 10
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import time
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.scoring import score_result
+from ..db.bulk import copy_records
+from ..db.database import async_session, engine
+from ..db.models import (
+    Base, Competitions, Complexes, Contributions, Mode, Participants, Payments,
+    QualifierStatus, QualifyingVideos, Results, ViewResult
+)
+
+
+# One unit of --scale: about our largest event so far
+PARTICIPANTS_PER_COMPETITION = 1000
+COMPLEXES_PER_COMPETITION = 24
+
+NAME_PREFIX = 'Synthetic'
+FIRST_NAMES = (
+    'Alex', 'Maria', 'Ivan', 'Olga', 'Dmitry', 'Anna', 'Sergey', 'Elena', 'Nikita', 'Daria',
+    'Pavel', 'Irina', 'Artem', 'Sofia', 'Maxim', 'Polina', 'Egor', 'Alina', 'Kirill', 'Vera',
+)
+LAST_NAMES = (
+    'Smirnov', 'Ivanova', 'Kuznetsov', 'Popova', 'Sokolov', 'Lebedeva', 'Kozlov', 'Novikova',
+    'Morozov', 'Petrova', 'Volkov', 'Soloveva', 'Vasilev', 'Zaitseva', 'Pavlov', 'Semenova',
+)
+# kind of workout: views its results are written in
+WORKOUTS = {
+    'lift': (ViewResult.kg,),
+    'row': (ViewResult.meters,),
+    'amrap': (ViewResult.reps,),
+    'for time': (ViewResult.min, ViewResult.cl),
+}
+
+
+def result_value(rng: random.Random, view: ViewResult) -> str:
+    """ A result the way judges write it down """
+    if view is ViewResult.kg:
+        value = f'{rng.randint(16, 100) * 2.5:g}'
+        return value + rng.choice(('', '', ' kg'))
+    if view is ViewResult.meters:
+        return f'{rng.randint(300, 2500) * 2}' + rng.choice(('', ' m'))
+    if view is ViewResult.reps:
+        value = str(rng.randint(40, 320))
+        return value + (f' tb {rng.randint(3, 11)}:{rng.randint(0, 59):02}' if rng.random() < 0.2 else '')
+    if view is ViewResult.min:
+        return f'{rng.randint(4, 19)}:{rng.randint(0, 59):02}'
+    return rng.choice(('cap+{}', 'cl {}', '{} reps')).format(rng.randint(1, 60))
+
+
+async def reserve_ids(session: AsyncSession, model: type[Base], count: int) -> list[int]:
+    if not count:
+        return []
+    sequence = func.pg_get_serial_sequence(model.__tablename__, 'id')
+    return list(await session.scalars(
+        select(func.nextval(sequence)).select_from(func.generate_series(1, count))
+    ))
+
+
+async def copy_model(session: AsyncSession, model: type[Base], columns: tuple[str, ...], records: list) -> int:
+    await copy_records(session, model.__tablename__, columns, records)
+    return len(records)
+
+
+async def generate_competition(
+        session: AsyncSession, rng: random.Random, index: int, participants: int, complexes: int
+) -> dict:
+    counts = dict.fromkeys(
+        (model.__tablename__ for model in (
+            Competitions, Contributions, Complexes, Participants, Payments, QualifyingVideos, Results
+        )), 0
+    )
+
+    [competition_id] = await reserve_ids(session, Competitions, 1)
+    date = datetime.datetime(2026, 1, 10, 9, tzinfo=datetime.timezone.utc) + datetime.timedelta(weeks=index)
+    counts['competitions'] += await copy_model(
+        session, Competitions, ('id', 'name', 'date', 'description'),
+        [(competition_id, f'{NAME_PREFIX} {index}', date, 'Generated by app.cli.generate_dataset')]
+    )
+    counts['contributions'] += await copy_model(
+        session, Contributions, ('competition_id', 'mode', 'price'),
+        [(competition_id, Mode.partial.value, 1500), (competition_id, Mode.full.value, 4500)]
+    )
+
+    complex_ids = await reserve_ids(session, Complexes, complexes)
+    workouts = [rng.choice(list(WORKOUTS)) for _ in complex_ids]
+    # the first quarter of the program is the online qualifying stage
+    qualifying = [position < max(1, complexes // 4) for position in range(complexes)]
+    records = []
+    for position, (complex_id, workout) in enumerate(zip(complex_ids, workouts)):
+        start = datetime.time(8 + position % 10, tzinfo=datetime.timezone.utc)
+        end = datetime.time(9 + position % 10, tzinfo=datetime.timezone.utc)
+        records.append((
+            complex_id, f'WOD {position + 1} ({workout})', competition_id,
+            f'Synthetic {workout} workout', qualifying[position], start, end
+        ))
+    counts['complexes'] += await copy_model(
+        session, Complexes,
+        ('id', 'name', 'competition_id', 'description', 'is_qualifying', 'start_time', 'end_time'),
+        records
+    )
+
+    participant_ids = await reserve_ids(session, Participants, participants)
+    records, payments, qualified = [], [], []
+    for participant_id in participant_ids:
+        is_qualified = rng.random() < 0.4
+        qualified.append(is_qualified)
+        records.append((
+            participant_id, competition_id,
+            f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            f'athlete{participant_id}@synthetic.test',
+            is_qualified, is_qualified and rng.random() < 0.8,
+        ))
+        paid = date - datetime.timedelta(days=rng.randint(1, 60), seconds=rng.randint(0, 86399))
+        if rng.random() < 0.85:
+            payments.append((participant_id, competition_id, Mode.partial.value, paid))
+            if rng.random() < 0.5:
+                payments.append((participant_id, competition_id, Mode.full.value, paid))
+    counts['participants'] += await copy_model(
+        session, Participants,
+        ('id', 'competition_id', 'fullname', 'email', 'is_qualified', 'is_arrived'), records
+    )
+    counts['payments'] += await copy_model(
+        session, Payments, ('participant_id', 'competition_id', 'mode', 'pay_datetime'), payments
+    )
+
+    videos, results = [], []
+    for complex_id, workout, is_qualifying in zip(complex_ids, workouts, qualifying):
+        for participant_id, is_qualified in zip(participant_ids, qualified):
+            if is_qualifying:
+                if rng.random() >= 0.7:
+                    continue
+                status = QualifierStatus.qualified if is_qualified else QualifierStatus.unqualified
+                videos.append((
+                    complex_id, participant_id,
+                    f'https://video.synthetic.test/{complex_id}/{participant_id}', status.value
+                ))
+            elif not is_qualified or rng.random() >= 0.95:
+                continue
+            # capped athletes of a "for time" workout are a minority
+            views = WORKOUTS[workout]
+            view = views[0] if len(views) == 1 or rng.random() < 0.75 else views[1]
+            value = result_value(rng, view)
+            results.append((complex_id, participant_id, view.value, value, *score_result(view, value)))
+    counts['qualifying_videos'] += await copy_model(
+        session, QualifyingVideos, ('complex_id', 'participant_id', 'video_url', 'qualifier_status'), videos
+    )
+    counts['results'] += await copy_model(
+        session, Results, ('complex_id', 'participant_id', 'view', 'result', 'score', 'tiebreak'), results
+    )
+    return counts
+
+
+async def main(seed: int, competitions: int, participants: int, complexes: int, replace: bool):
+    rng = random.Random(seed)
+    names = [f'{NAME_PREFIX} {index}' for index in range(competitions)]
+    started = time.perf_counter()
+    totals: dict[str, int] = {}
+    try:
+        async with async_session() as session:
+            existing = await session.scalar(
+                select(func.count()).select_from(Competitions).where(Competitions.name.in_(names))
+            )
+            if existing and not replace:
+                raise SystemExit(f'{existing} synthetic competition(s) already exist, pass --replace')
+            await session.execute(delete(Competitions).where(Competitions.name.in_(names)))
+
+            for index in range(competitions):
+                counts = await generate_competition(session, rng, index, participants, complexes)
+                for table, count in counts.items():
+                    totals[table] = totals.get(table, 0) + count
+            await session.commit()
+
+        async with engine.connect() as connection:
+            # fresh statistics so the planner sees the new volumes right away
+            await connection.execution_options(isolation_level='AUTOCOMMIT')
+            await connection.execute(text('ANALYZE ' + ', '.join(totals)))
+    finally:
+        await engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    print(json.dumps({
+        'seed': seed, 'competitions': competitions, 'participants': participants, 'complexes': complexes,
+        'rows': totals, 'seconds': round(elapsed, 2), 'rows_per_second': round(rows / elapsed),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--competitions', type=int, default=1)
+    parser.add_argument('--scale', type=float, default=1, help='multiplier of the participants per competition')
+    parser.add_argument('--participants', type=int, help=f'per competition, default {PARTICIPANTS_PER_COMPETITION} x scale')
+    parser.add_argument('--complexes', type=int, default=COMPLEXES_PER_COMPETITION, help='per competition')
+    parser.add_argument('--replace', action='store_true', help='delete synthetic competitions of a previous run first')
+    args = parser.parse_args()
+    participants = args.participants or round(PARTICIPANTS_PER_COMPETITION * args.scale)
+    asyncio.run(main(args.seed, args.competitions, participants, args.complexes, args.replace))
@@ -0,0 +1,42 @@
+"""
+Import a judges' score sheet into one complex.
+
+CSV needs a header with view, result and participant_id and/or email;
+JSONL takes one object with the same keys per line.
+
+    python -m app.cli.import_results scores.csv --complex-id 3
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from ..api.crud.results_import import import_results_from_db, read_import_rows, ComplexNotFound
+from ..api.schemas.competitions import ImportFormat
+from ..db.database import async_session, engine
+
+
+async def main(path: Path, complex_id: int, format: ImportFormat):
+    try:
+        with path.open(encoding='utf-8-sig', newline='') as stream:
+            async with async_session() as session:
+                report = await import_results_from_db(
+                    complex_id=complex_id, rows=read_import_rows(stream, format), session=session
+                )
+    except ComplexNotFound as exc:
+        raise SystemExit(str(exc))
+    finally:
+        await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', type=Path)
+    parser.add_argument('--complex-id', type=int, required=True)
+    parser.add_argument('--format', type=ImportFormat, choices=list(ImportFormat))
+    args = parser.parse_args()
+    format = args.format or (
+        ImportFormat.jsonl if args.path.suffix in ('.jsonl', '.ndjson') else ImportFormat.csv
+    )
+    asyncio.run(main(args.path, args.complex_id, format))
@@ -0,0 +1,38 @@
+"""
+Apply the qualification cut of a competition.
+
+Athletes are ranked over every qualifying complex; the best --top places,
+or the best --percentile percent of the entrants, qualify.
+
+    python -m app.cli.qualify --competition-id 3 --top 40
+"""
+import argparse
+import asyncio
+import json
+
+from ..api.crud.participants import qualify_participants_from_db
+from ..db.database import async_session, engine
+
+
+async def main(competition_id: int, top: int | None, percentile: float | None, standings: bool):
+    try:
+        async with async_session() as session:
+            report = await qualify_participants_from_db(
+                competition_id=competition_id, session=session, top=top, percentile=percentile
+            )
+    finally:
+        await engine.dispose()
+    if not standings:
+        report.pop('standings')
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--competition-id', type=int, required=True)
+    cut = parser.add_mutually_exclusive_group(required=True)
+    cut.add_argument('--top', type=int, help='number of places that qualify')
+    cut.add_argument('--percentile', type=float, help='percent of the entrants that qualify')
+    parser.add_argument('--standings', action='store_true', help='print every athlete, not only the totals')
+    args = parser.parse_args()
+    asyncio.run(main(args.competition_id, args.top, args.percentile, args.standings))
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Hashable
+
+
+class Subscription:
+    """
+    Bounded queue of one subscriber.
+
+    A subscriber that falls ``maxsize`` messages behind is dropped instead of
+    slowing down the publisher: ``overflowed`` is set and the iterator ends.
+    """
+
+    def __init__(self, broadcaster: 'Broadcaster', topics: tuple[Hashable, ...], maxsize: int) -> None:
+        self._broadcaster = broadcaster
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, message: Any) -> None:
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._broadcaster.unsubscribe(self)
+        if self.overflowed:
+            # the backlog is stale anyway, the reader has to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        if not self.queue.full():
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: float | None = None) -> Any:
+        """ Next message, None once closed; raises TimeoutError when idle for ``timeout`` """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def __aenter__(self) -> 'Subscription':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Broadcaster:
+    """ In-process fan-out of messages to the subscribers of a topic """
+
+    def __init__(self, max_subscribers: int) -> None:
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.dropped = 0
+        self._topics: dict[Hashable, set[Subscription]] = {}
+
+    @property
+    def full(self) -> bool:
+        return self.subscribers >= self.max_subscribers
+
+    def subscribe(self, *topics: Hashable, maxsize: int) -> Subscription | None:
+        """ None when ``max_subscribers`` are already connected """
+        if self.full:
+            return None
+        subscription = Subscription(self, topics, maxsize)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+        self.subscribers -= 1
+        if subscription.overflowed:
+            self.dropped += 1
+
+    def publish(self, topic: Hashable, message: Any) -> int:
+        subscribers = self._topics.get(topic, ())
+        for subscription in list(subscribers):
+            subscription.put(message)
+        return len(subscribers)
+
+    def publish_all(self, message: Any) -> None:
+        for subscription in {s for subscribers in self._topics.values() for s in subscribers}:
+            subscription.put(message)
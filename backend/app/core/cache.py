@@ -0,0 +1,114 @@
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU mapping whose entries also expire after ``ttl`` seconds.
+
+    Not thread-safe: it is meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        item = self._data.get(key)
+        if item is not None and item[0] > time.monotonic():
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return item[1]
+        if item is not None:
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits,
+            'misses': self.misses, 'evictions': self.evictions,
+        }
+
+
+class SortedStandings:
+    """
+    Rows of one ranking kept ordered by (score, tiebreak).
+
+    ``upsert`` repositions a single participant with a bisect instead of
+    re-sorting the whole list.
+    """
+
+    def __init__(self, rows: list[dict] = ()) -> None:
+        self._keys: list[tuple[float, float, int]] = []
+        self._rows: dict[int, dict] = {}
+        for row in rows:
+            self.upsert(row)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _key(row: dict) -> tuple[float, float, int]:
+        return row['score'], row['tiebreak'], row['participant_id']
+
+    def upsert(self, row: dict) -> None:
+        previous = self._rows.get(row['participant_id'])
+        if previous is not None:
+            key = self._key(previous)
+            del self._keys[bisect_left(self._keys, key)]
+        self._rows[row['participant_id']] = row
+        insort(self._keys, self._key(row))
+
+    def remove(self, participant_id: int) -> None:
+        previous = self._rows.pop(participant_id, None)
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, self._key(previous))]
+
+    def ranked(self) -> list[dict]:
+        """ Rows in order with competition places ("1224") """
+        ranked = []
+        place, previous = 0, None
+        for position, key in enumerate(self._keys, start=1):
+            if key[:2] != previous:
+                place, previous = position, key[:2]
+            ranked.append({**self._rows[key[2]], 'place': place})
+        return ranked
@@ -3,7 +3,7 @@ from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from .log import Logger
 
-log = Logger(__name__, 'base.log').logger
+log = Logger(__name__, 'app/base.log').logger
 
 class Settings(BaseSettings):
 
@@ -24,11 +24,83 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str
     POSTGRES_PORT: int
     POSTGRES_EXTERNAL_PORT: int
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_POOL_MAX_OVERFLOW: int = 20
+    POSTGRES_POOL_TIMEOUT: float = 30
+    # comma separated DSNs of read replicas, GET routes read from them
+    POSTGRES_REPLICAS: str = ''
+    # a replica further behind than this many seconds gets no reads
+    POSTGRES_REPLICA_MAX_LAG: float = 5
+    POSTGRES_REPLICA_CHECK_INTERVAL: float = 2
+
+    # Logging
+    LOG_FILE: str = 'app/base.log'
+    LOG_LEVEL: str = 'INFO'
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    # INFO logs every statement, DEBUG also the rows; sampled by SQL_LOG_SAMPLE_RATE
+    SQL_LOG_LEVEL: str = 'WARNING'
+    SQL_LOG_SAMPLE_RATE: float = 1.0
+
+    # Caches
+    LEADERBOARD_CACHE_SIZE: int = 256
+    LEADERBOARD_CACHE_TTL: float = 300
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: float = 60
+
+    # Live results (SSE)
+    LIVE_MAX_SUBSCRIBERS: int = 10000
+    # a subscriber this many events behind is disconnected
+    LIVE_QUEUE_SIZE: int = 64
+    LIVE_HEARTBEAT: float = 15
+
+    # Background purge of large competitions: rows per DELETE, each in its own transaction
+    PURGE_CHUNK_SIZE: int = 5000
+    PURGE_JOBS_KEPT: int = 100
+
+    # Idempotency-Key: 'memory' per worker, 'postgres' shared through idempotency_keys
+    IDEMPOTENCY_STORE: str = 'memory'
+    IDEMPOTENCY_TTL: float = 24 * 60 * 60
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    # running requests renew their key's lock; one not renewed for this long belongs to a dead worker
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 120
+    # larger responses are passed through but not stored
+    IDEMPOTENCY_MAX_BODY: int = 256 * 1024
+    IDEMPOTENCY_PURGE_EVERY: int = 1000
+
+    # Rate limits as "<requests>/<seconds>": bursts of <requests>, refilled evenly over <seconds>;
+    # an empty limit turns that group off. Buckets are 'memory' per worker or 'postgres' shared
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = 'memory'
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # rows idle this long are full buckets again and get purged every RATE_LIMIT_PURGE_EVERY takes
+    RATE_LIMIT_IDLE: float = 60 * 60
+    RATE_LIMIT_PURGE_EVERY: int = 10000
+    # /token, per client IP and per attempted username from one IP
+    RATE_LIMIT_LOGIN_IP: str = '20/60'
+    RATE_LIMIT_LOGIN_USERNAME: str = '10/300'
+    # every authenticated route group, per user
+    RATE_LIMIT_USER: str = '1200/60'
+    # writes only: account creation, registration and check-in, qualifying submissions
+    RATE_LIMIT_USER_CREATE: str = '10/60'
+    RATE_LIMIT_REGISTRATION: str = '300/60'
+    RATE_LIMIT_QUALIFYING: str = '60/60'
+
+    # Qualifying review queue: an unsubmitted lease returns to the pool after this many seconds
+    QUALIFYING_LEASE_SECONDS: int = 600
 
     # JWT auth
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     TOKEN_SECRET_KEY: str
     ALGORITHM: str
+    # bcrypt runs in a thread pool of this size, extra requests queue up to the limit
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # carry id and is_superuser in the token so requests need no user lookup
+    TOKEN_EMBED_PRINCIPAL: bool = False
+    # QR codes for event-day check-in are mailed ahead, they stay valid this long
+    CHECKIN_TOKEN_EXPIRE_DAYS: int = 90
+    CHECKIN_BATCH_LIMIT: int = 1000
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
@@ -41,4 +113,20 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @property
+    def REPLICA_DATABASE_URIS(self) -> list[str]:
+        return [dsn.strip() for dsn in self.POSTGRES_REPLICAS.split(',') if dsn.strip()]
+
+    @property
+    def PSYCOPG_DATABASE_URI(self) -> str:
+        # plain libpq conninfo for connections opened outside SQLAlchemy
+        return str(MultiHostUrl.build(
+            scheme="postgresql",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_HOST,
+            port=self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        ))
+
 settings = Settings()
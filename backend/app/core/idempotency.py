@@ -0,0 +1,328 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import tempfile
+import uuid
+from typing import Iterable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .cache import TTLCache
+from .config import settings
+from .log import Logger
+from .metrics import registry, register_cache, Counter
+from .security import read_token_subject
+from ..db.database import async_session
+from ..db.models import IdempotencyKeys
+
+
+log = Logger(__name__, 'app/base.log').logger
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# request bodies are handed back to the app in chunks of this size
+REPLAY_CHUNK = 64 * 1024
+# "try again later" answers: a retry after Retry-After must run the request, not replay them
+RETRYABLE_STATUSES = frozenset({408, 409, 429})
+
+idempotency_requests = registry.register(Counter(
+    'idempotency_requests_total', 'POST requests carrying an Idempotency-Key, by outcome.', ('outcome',)
+))
+
+
+class StoredResponse:
+    """
+    The first response of a key; ``status`` is None while that request
+    still runs, under the reservation of ``owner``
+    """
+    __slots__ = ('fingerprint', 'status', 'headers', 'body', 'owner')
+
+    def __init__(
+            self, fingerprint: str, status: int | None = None, headers: list = (), body: bytes = b'',
+            owner: str | None = None
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = list(headers)
+        self.body = body
+        self.owner = owner
+
+
+class MemoryIdempotencyStore:
+    """ Responses of this worker only, bounded and expiring like the other caches """
+
+    def __init__(self, maxsize: int, ttl: float, lock_timeout: float) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock_timeout = lock_timeout
+        register_cache('idempotency', self.cache)
+
+    def _owned(self, key: str, owner: str) -> bool:
+        stored = self.cache.get(key, count=False)
+        return stored is not None and stored.status is None and stored.owner == owner
+
+    async def reserve(self, key: str, fingerprint: str, owner: str) -> StoredResponse | None:
+        """ What is stored for the key, or None when ``owner`` now holds it """
+        stored = self.cache.get(key)
+        if stored is None:
+            self.cache.set(key, StoredResponse(fingerprint, owner=owner), ttl=self.lock_timeout)
+        return stored
+
+    async def extend(self, key: str, owner: str) -> None:
+        if self._owned(key, owner):
+            self.cache.set(key, self.cache.get(key, count=False), ttl=self.lock_timeout)
+
+    async def save(self, key: str, owner: str, response: StoredResponse) -> None:
+        if self._owned(key, owner):
+            self.cache.set(key, response)
+
+    async def release(self, key: str, owner: str) -> None:
+        if self._owned(key, owner):
+            self.cache.pop(key)
+
+
+class PostgresIdempotencyStore:
+    """ Shared by every worker through the ``idempotency_keys`` table """
+
+    def __init__(self, ttl: float, lock_timeout: float, purge_every: int) -> None:
+        self.ttl = datetime.timedelta(seconds=ttl)
+        self.lock_timeout = datetime.timedelta(seconds=lock_timeout)
+        self.purge_every = purge_every
+        self._saves = 0
+
+    async def reserve(self, key: str, fingerprint: str, owner: str) -> StoredResponse | None:
+        expires_at = func.now() + self.ttl
+        locked_until = func.now() + self.lock_timeout
+        async with async_session() as session:
+            # an expired row, or a pending one whose worker died, is taken over as if it did not exist
+            reserved = await session.scalar(
+                pg_insert(IdempotencyKeys)
+                .values(
+                    key=key, fingerprint=fingerprint, lock_owner=owner, locked_until=locked_until,
+                    expires_at=expires_at,
+                )
+                .on_conflict_do_update(
+                    index_elements=[IdempotencyKeys.key],
+                    set_={
+                        'fingerprint': fingerprint, 'status': None, 'headers': None, 'body': None,
+                        'lock_owner': owner, 'locked_until': locked_until, 'expires_at': expires_at,
+                    },
+                    where=(IdempotencyKeys.expires_at < func.now()) | (
+                        IdempotencyKeys.status.is_(None)
+                        & func.coalesce(IdempotencyKeys.locked_until < func.now(), True)
+                    ),
+                )
+                .returning(IdempotencyKeys.key)
+            )
+            if reserved is not None:
+                await session.commit()
+                return None
+            row = (await session.execute(
+                select(
+                    IdempotencyKeys.fingerprint, IdempotencyKeys.status,
+                    IdempotencyKeys.headers, IdempotencyKeys.body
+                )
+                .where(IdempotencyKeys.key == key)
+            )).first()
+        if row is None:
+            # released in between: reported as in progress, the retry will own it
+            return StoredResponse(fingerprint)
+        if row.status is None:
+            return StoredResponse(row.fingerprint)
+        headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in row.headers]
+        return StoredResponse(row.fingerprint, row.status, headers, row.body)
+
+    def _owned(self, key: str, owner: str):
+        # a request that outlived its lock must not touch the reservation of whoever took over
+        return (
+            (IdempotencyKeys.key == key) & (IdempotencyKeys.lock_owner == owner)
+            & IdempotencyKeys.status.is_(None)
+        )
+
+    async def extend(self, key: str, owner: str) -> None:
+        async with async_session() as session:
+            await session.execute(
+                update(IdempotencyKeys)
+                .where(self._owned(key, owner))
+                .values(locked_until=func.now() + self.lock_timeout)
+            )
+            await session.commit()
+
+    async def save(self, key: str, owner: str, response: StoredResponse) -> None:
+        headers = [[name.decode('latin-1'), value.decode('latin-1')] for name, value in response.headers]
+        async with async_session() as session:
+            await session.execute(
+                update(IdempotencyKeys)
+                .where(self._owned(key, owner))
+                .values(
+                    status=response.status, headers=headers, body=response.body,
+                    lock_owner=None, locked_until=None,
+                )
+            )
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                await session.execute(delete(IdempotencyKeys).where(IdempotencyKeys.expires_at < func.now()))
+            await session.commit()
+
+    async def release(self, key: str, owner: str) -> None:
+        async with async_session() as session:
+            await session.execute(delete(IdempotencyKeys).where(self._owned(key, owner)))
+            await session.commit()
+
+
+def create_idempotency_store():
+    if settings.IDEMPOTENCY_STORE == 'postgres':
+        return PostgresIdempotencyStore(
+            ttl=settings.IDEMPOTENCY_TTL, lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+            purge_every=settings.IDEMPOTENCY_PURGE_EVERY,
+        )
+    return MemoryIdempotencyStore(
+        maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_TTL,
+        lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+    )
+
+
+async def send_error(send, status: int, detail: str, headers: tuple = ()) -> None:
+    body = json.dumps({'detail': detail}).encode()
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()), *headers
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the first response of a POST for every retry with the same
+    ``Idempotency-Key``, without running the endpoint again.
+
+    Keys are scoped to the caller (the access token's subject, so a
+    refreshed token keeps its keys) and the target URL. Requests without a
+    valid access token, and the ``exclude``d paths such as the login that
+    hands tokens out, pass straight through: nothing of theirs is stored. The body is hashed
+    as it arrives and spooled to disk past IDEMPOTENCY_MAX_BODY, so large
+    uploads are not held in memory.
+
+    Reusing a key for a different body is refused with 422, a retry
+    arriving while the first request still runs gets 409. The running
+    request renews its lock every third of IDEMPOTENCY_LOCK_TIMEOUT; a
+    lock left to lapse means its worker died and a retry takes the key
+    over, the dead request's reservation can then no longer be saved or
+    released.
+    Server errors, 408/409/429 and oversized responses are not stored, so
+    they can be retried.
+    """
+
+    def __init__(self, app, store=None, exclude: Iterable[str] = ()) -> None:
+        self.app = app
+        self.store = store if store is not None else create_idempotency_store()
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST':
+            return await self.app(scope, receive, send)
+        headers = dict(scope['headers'])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER.lower().encode())
+        if not idempotency_key or scope['path'] in self.exclude:
+            return await self.app(scope, receive, send)
+        authorization = headers.get(b'authorization', b'').decode('latin-1')
+        scheme, _, token = authorization.partition(' ')
+        subject = read_token_subject(token) if scheme.lower() == 'bearer' else None
+        if subject is None:
+            # refused by the app anyway, not worth a round trip to the store
+            return await self.app(scope, receive, send)
+
+        # the body is read up front to fingerprint it, then handed to the app as is
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.IDEMPOTENCY_MAX_BODY)
+        try:
+            await self.handle(scope, receive, send, subject, idempotency_key, spool)
+        finally:
+            spool.close()
+
+    async def handle(self, scope, receive, send, subject: str, idempotency_key: bytes, spool) -> None:
+        body = hashlib.sha256()
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                # the client left before sending its body, there is nobody to answer
+                return
+            body.update(message.get('body', b''))
+            spool.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+
+        scoped = hashlib.sha256()
+        for part in (subject.encode(), scope['path'].encode(), scope['query_string'], idempotency_key):
+            scoped.update(part + b'\0')
+        key, fingerprint = scoped.hexdigest(), body.hexdigest()
+
+        owner = uuid.uuid4().hex
+        stored = await self.store.reserve(key, fingerprint, owner)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                idempotency_requests.inc('mismatch')
+                return await send_error(send, 422, f'{IDEMPOTENCY_HEADER} was already used with another request body')
+            if stored.status is None:
+                idempotency_requests.inc('in_progress')
+                return await send_error(
+                    send, 409, f'A request with this {IDEMPOTENCY_HEADER} is in progress', ((b'retry-after', b'1'),)
+                )
+            idempotency_requests.inc('replayed')
+            await send({
+                'type': 'http.response.start', 'status': stored.status,
+                'headers': [*stored.headers, (REPLAYED_HEADER.lower().encode(), b'true')],
+            })
+            await send({'type': 'http.response.body', 'body': stored.body})
+            return
+
+        idempotency_requests.inc('stored')
+        total, replaying = spool.tell(), True
+        spool.seek(0)
+
+        async def receive_buffered():
+            nonlocal replaying
+            if not replaying:
+                return await receive()
+            chunk = spool.read(REPLAY_CHUNK)
+            replaying = spool.tell() < total
+            return {'type': 'http.request', 'body': chunk, 'more_body': replaying}
+
+        response = StoredResponse(fingerprint)
+        chunks, size = [], 0
+
+        async def send_captured(message):
+            nonlocal size
+            if message['type'] == 'http.response.start':
+                response.status = message['status']
+                response.headers = list(message.get('headers', []))
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+                if size <= settings.IDEMPOTENCY_MAX_BODY:
+                    chunks.append(message.get('body', b''))
+            await send(message)
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(settings.IDEMPOTENCY_LOCK_TIMEOUT / 3)
+                try:
+                    await self.store.extend(key, owner)
+                except Exception:
+                    log.exception('Could not extend the lock of an idempotency key')
+
+        completed = False
+        renewing = asyncio.create_task(heartbeat())
+        try:
+            await self.app(scope, receive_buffered, send_captured)
+            completed = True
+        finally:
+            renewing.cancel()
+            if completed and response.status is not None and response.status < 500 \
+                    and response.status not in RETRYABLE_STATUSES and size <= settings.IDEMPOTENCY_MAX_BODY:
+                response.body = b''.join(chunks)
+                await self.store.save(key, owner, response)
+            else:
+                await self.store.release(key, owner)
@@ -0,0 +1,239 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+
+# Minimal Prometheus primitives: observing is a dict lookup and a bisect,
+# rendering the text format only happens on scrape.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in self._values.items():
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Gauge:
+    """
+    Value read from ``collect`` at scrape time: a number or {labels: number}.
+
+    ``type='counter'`` exposes a monotonic value kept elsewhere (cache hits...).
+    """
+
+    def __init__(
+            self, name: str, documentation: str, collect: Callable[[], float | dict],
+            labelnames: tuple[str, ...] = (), type: str = 'gauge'
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        self.type = type
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.type}'
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+
+    def __init__(
+            self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # per label set: [count per bucket (non cumulative) + overflow, sum]
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        names = (*self.labelnames, 'le')
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(names, (*labels, _number(bound)))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('method', 'route', 'status')
+))
+http_request_db_statements = registry.register(Histogram(
+    'http_request_db_statements', 'SQL statements executed per request.', ('method', 'route'),
+    buckets=COUNT_BUCKETS
+))
+http_request_db_duration = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL statements per request.', ('method', 'route')
+))
+db_statements = registry.register(Counter(
+    'db_statements_total', 'SQL statements executed, in and outside requests.'
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+))
+db_pool_checkout_timeouts = registry.register(Counter(
+    'db_pool_checkout_timeouts_total', 'Checkouts that gave up after POSTGRES_POOL_TIMEOUT.'
+))
+
+# TTLCache instances by name, see register_cache
+caches: dict = {}
+
+
+def register_cache(name: str, cache) -> None:
+    caches[name] = cache
+
+
+def _cache_stat(field: str) -> Callable[[], dict]:
+    return lambda: {(name,): cache.stats()[field] for name, cache in caches.items()}
+
+
+registry.register(Gauge('cache_entries', 'Entries held by a cache.', _cache_stat('size'), ('cache',)))
+registry.register(Gauge(
+    'cache_hits_total', 'Cache lookups that found a live entry.', _cache_stat('hits'), ('cache',), type='counter'
+))
+registry.register(Gauge(
+    'cache_misses_total', 'Cache lookups that found nothing.', _cache_stat('misses'), ('cache',), type='counter'
+))
+registry.register(Gauge(
+    'cache_evictions_total', 'Entries dropped to stay under maxsize.', _cache_stat('evictions'), ('cache',),
+    type='counter'
+))
+
+
+class RequestStats:
+    __slots__ = ('statements', 'db_seconds')
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar('request_stats', default=None)
+
+
+def record_statement(seconds: float) -> None:
+    db_statements.inc()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+
+
+class MetricsMiddleware:
+    """ Latency and SQL work of each request, labelled by route template """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._routes: dict[tuple, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        key = (endpoint, scope['method'])
+        route = self._routes.get(key)
+        if route is None:
+            route = next(
+                (
+                    r.path for r in scope['app'].routes
+                    if getattr(r, 'endpoint', None) is endpoint
+                    and scope['method'] in (getattr(r, 'methods', None) or (scope['method'],))
+                ),
+                'unmatched'
+            )
+            self._routes[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stats.reset(token)
+            route = self._route(scope)
+            http_request_duration.observe(elapsed, scope['method'], route, status)
+            http_request_db_statements.observe(stats.statements, scope['method'], route)
+            http_request_db_duration.observe(stats.db_seconds, scope['method'], route)
@@ -0,0 +1,115 @@
+import time
+
+from sqlalchemy import text
+
+from .cache import TTLCache
+from .config import settings
+from .log import Logger
+from .metrics import registry, register_cache, Counter
+from ..db.database import async_session
+
+
+log = Logger(__name__, 'app/base.log').logger
+
+
+rate_limited = registry.register(Counter(
+    'rate_limited_total', 'Requests refused with 429, by limited group.', ('group',)
+))
+
+
+class RateLimit:
+    """ Bursts of up to ``burst`` requests, refilled at ``rate`` requests per second """
+    __slots__ = ('burst', 'rate')
+
+    def __init__(self, burst: int, period: float) -> None:
+        if burst < 1 or period <= 0:
+            raise ValueError(f'Invalid rate limit {burst}/{period}')
+        self.burst = burst
+        self.rate = burst / period
+
+    def __repr__(self) -> str:
+        return f'<RateLimit:{self.burst}/{self.burst / self.rate:g}s>'
+
+
+def parse_limit(limit: str) -> RateLimit | None:
+    """ "20/60" is 20 requests per 60 seconds; an empty limit is no limit """
+    if not limit:
+        return None
+    burst, _, period = limit.partition('/')
+    return RateLimit(int(burst), float(period or 1))
+
+
+class MemoryBucketStore:
+    """ Buckets of this worker only: each worker grants the full limit """
+
+    def __init__(self, maxsize: int, idle: float) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=idle)
+        register_cache('ratelimit', self.cache)
+
+    async def take(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        """ Seconds to wait before ``cost`` tokens are available, 0 when they were taken """
+        now = time.monotonic()
+        tokens, updated = self.cache.get(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / limit.rate
+        # forgetting a bucket once it would be full again changes nothing
+        self.cache.set(key, (tokens, now), ttl=(limit.burst - tokens) / limit.rate)
+        return wait
+
+
+REFILL = 'least(:burst, bucket.tokens + extract(epoch FROM now() - bucket.updated_at) * :rate)'
+# a refused take leaves the refilled tokens alone, so retrying early does not push the wait further
+TAKE = text(f"""
+INSERT INTO rate_limit_buckets AS bucket (key, tokens, allowed, updated_at)
+VALUES (:key, :burst - :cost, :burst >= :cost, now())
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE WHEN {REFILL} >= :cost THEN {REFILL} - :cost ELSE {REFILL} END,
+    allowed = {REFILL} >= :cost,
+    updated_at = now()
+RETURNING tokens, allowed
+""")
+PURGE = text('DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)')
+
+
+class PostgresBucketStore:
+    """ Shared by every worker through the unlogged ``rate_limit_buckets`` table """
+
+    def __init__(self, idle: float, purge_every: int) -> None:
+        self.idle = idle
+        self.purge_every = purge_every
+        self._takes = 0
+
+    async def take(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        async with async_session() as session:
+            row = (await session.execute(
+                TAKE, {'key': key, 'burst': limit.burst, 'rate': limit.rate, 'cost': cost}
+            )).one()
+            self._takes += 1
+            if self._takes % self.purge_every == 0:
+                await session.execute(PURGE, {'idle': self.idle})
+            await session.commit()
+        return 0.0 if row.allowed else (cost - row.tokens) / limit.rate
+
+
+def create_bucket_store():
+    if settings.RATE_LIMIT_STORE == 'postgres':
+        return PostgresBucketStore(idle=settings.RATE_LIMIT_IDLE, purge_every=settings.RATE_LIMIT_PURGE_EVERY)
+    return MemoryBucketStore(maxsize=settings.RATE_LIMIT_MAX_KEYS, idle=settings.RATE_LIMIT_IDLE)
+
+
+bucket_store = create_bucket_store()
+
+
+async def take(group: str, subject: str, limit: RateLimit | None, cost: int = 1) -> float:
+    """ Seconds ``subject`` has to wait before calling ``group`` again, 0 when it may go on """
+    if limit is None or not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    wait = await bucket_store.take(f'{group}:{subject}', limit, cost)
+    if wait:
+        rate_limited.inc(group)
+        log.debug('Rate limited %s on %s for %.1fs', subject, group, wait)
+    return wait
@@ -0,0 +1,126 @@
+import re
+import numpy as np
+from ..db.models import ViewResult
+
+
+# Every result is turned into a pair (score, tiebreak) where lower is better.
+# kg / meters / reps are negated, min is the time in seconds and a capped
+# result (cl) lands after every finisher, ordered by the reps completed.
+CAP_OFFSET = 1e9
+UNSCORED = np.inf
+
+_NUMBER = re.compile(r'^\s*(?P<value>\d+(?:[.,]\d+)?)\s*[^\W\d_]*\.?\s*$')
+_TIME = re.compile(r'^\s*(?:(?P<h>\d+):)??(?P<m>\d+):(?P<s>\d{1,2}(?:[.,]\d+)?)\s*$')
+_CAPPED = re.compile(r'^\s*(?:cap|cl)?\s*\+?\s*(?P<reps>\d+)\s*(?:reps?)?\s*$', re.IGNORECASE)
+_TIEBREAK = re.compile(r'^(?P<value>.+?)\s+tb\s*(?P<tiebreak>\S+)\s*$', re.IGNORECASE)
+
+
+def parse_number(raw: str) -> float:
+    match = _NUMBER.match(raw)
+    if not match:
+        raise ValueError(f'Not a number: {raw!r}')
+    return float(match['value'].replace(',', '.'))
+
+
+def parse_time(raw: str) -> float:
+    """ "mm:ss", "h:mm:ss" or a bare number of minutes, in seconds """
+    match = _TIME.match(raw)
+    if not match:
+        return parse_number(raw) * 60
+    seconds = float(match['s'].replace(',', '.'))
+    if seconds >= 60:
+        raise ValueError(f'Not a time: {raw!r}')
+    return int(match['h'] or 0) * 3600 + int(match['m']) * 60 + seconds
+
+
+def parse_capped(raw: str) -> float:
+    match = _CAPPED.match(raw)
+    if not match:
+        raise ValueError(f'Not a capped result: {raw!r}')
+    return float(match['reps'])
+
+
+def parse_result(view: ViewResult, raw: str) -> tuple[float, float]:
+    """
+    Parse ``Results.result`` according to its ``ViewResult``.
+
+    An optional tiebreak time may follow the result as ``"<result> tb mm:ss"``.
+    Raises ValueError when the value can not be read.
+    """
+    view = ViewResult(view)
+    tiebreak = UNSCORED
+    match = _TIEBREAK.match(raw)
+    if match:
+        raw, tiebreak = match['value'], parse_time(match['tiebreak'])
+
+    if view is ViewResult.min:
+        score = parse_time(raw)
+    elif view is ViewResult.cl:
+        score = CAP_OFFSET - parse_capped(raw)
+    else:
+        score = -parse_number(raw)
+
+    return score, tiebreak
+
+
+def score_result(view: ViewResult, raw: str) -> tuple[float, float]:
+    """ Same as parse_result, but unreadable results rank last instead of raising """
+    try:
+        return parse_result(view, raw)
+    except ValueError:
+        return UNSCORED, UNSCORED
+
+
+def rank(groups: np.ndarray, scores: np.ndarray, tiebreaks: np.ndarray) -> np.ndarray:
+    """
+    Competition ranking ("1224") of every row inside its group.
+
+    Rows with equal (score, tiebreak) in the same group share a place.
+    Returns the place of each row in input order.
+    """
+    size = len(scores)
+    order = np.lexsort((tiebreaks, scores, groups))
+    groups, scores, tiebreaks = groups[order], scores[order], tiebreaks[order]
+
+    positions = np.arange(size)
+    new_group = np.ones(size, dtype=bool)
+    new_group[1:] = groups[1:] != groups[:-1]
+    new_value = new_group.copy()
+    new_value[1:] |= (scores[1:] != scores[:-1]) | (tiebreaks[1:] != tiebreaks[:-1])
+
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    value_start = np.maximum.accumulate(np.where(new_value, positions, 0))
+
+    places = np.empty(size, dtype=np.int64)
+    places[order] = value_start - group_start + 1
+    return places
+
+
+def placement_matrix(
+        participant_ids: np.ndarray, complex_ids: np.ndarray,
+        result_participants: np.ndarray, result_complexes: np.ndarray,
+        result_places: np.ndarray
+) -> np.ndarray:
+    """
+    Places as a (participants x complexes) matrix.
+
+    An athlete without a result in a complex gets the place after the last
+    possible one, len(participant_ids).
+    """
+    matrix = np.full((len(participant_ids), len(complex_ids)), len(participant_ids), dtype=np.int64)
+    rows = np.searchsorted(participant_ids, result_participants)
+    cols = np.searchsorted(complex_ids, result_complexes)
+    matrix[rows, cols] = result_places
+    return matrix
+
+
+def standings(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Overall points (sum of places, lower is better) and overall place.
+
+    Equal points are broken by the best single placement.
+    """
+    points = matrix.sum(axis=1)
+    best = matrix.min(axis=1, initial=np.iinfo(np.int64).max)
+    places = rank(np.zeros(len(points), dtype=np.int64), points, best)
+    return points, places
@@ -1,6 +1,9 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from .config import settings
 from jose import JWTError, jwt
 from .log import Logger
+from .metrics import registry, Gauge
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 
@@ -21,9 +24,92 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
+def read_token_subject(token: str) -> str | None:
+    """ ``sub`` of a valid access token, None when it is forged, expired or malformed """
+    try:
+        payload = jwt.decode(token, settings.TOKEN_SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get('sub')
+    return subject if isinstance(subject, str) else None
+
+
+CHECKIN_AUDIENCE = 'checkin'
+
+
+def create_checkin_token(participant_id: int, competition_id: int) -> str:
+    """ Signed QR payload; the audience keeps it from being accepted as an access token """
+    expire = datetime.now() + timedelta(days=settings.CHECKIN_TOKEN_EXPIRE_DAYS)
+    return jwt.encode(
+        {'sub': str(participant_id), 'cid': competition_id, 'aud': CHECKIN_AUDIENCE, 'exp': expire},
+        settings.TOKEN_SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+
+
+def read_checkin_token(token: str) -> tuple[int, int] | None:
+    """ (participant_id, competition_id), None when the token is forged, expired or malformed """
+    try:
+        payload = jwt.decode(
+            token, settings.TOKEN_SECRET_KEY, algorithms=[settings.ALGORITHM], audience=CHECKIN_AUDIENCE,
+            # jose only checks an audience that is present, a token without one must not pass either
+            options={'require_aud': True}
+        )
+        return int(payload['sub']), int(payload['cid'])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    bcrypt off the event loop.
+
+    At most ``workers`` hashes run at once (bcrypt releases the GIL, so
+    threads are enough) and at most ``max_pending`` may be running or
+    queued; beyond that HashingOverloaded is raised instead of waiting.
+    """
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingOverloaded('Password hashing queue is full')
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS, max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+registry.register(Gauge(
+    'password_hash_pending', 'Hashes running or queued in the bcrypt pool.', lambda: password_hasher.pending
+))
+registry.register(Gauge(
+    'password_hash_rejected_total', 'Hashes refused because the queue was full.',
+    lambda: password_hasher.rejected, type='counter'
+))
@@ -0,0 +1,25 @@
+from typing import Iterable, Sequence
+import psycopg
+from psycopg import sql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def get_driver_connection(session: AsyncSession) -> psycopg.AsyncConnection:
+    """ The psycopg connection behind the session, inside its transaction """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+async def copy_records(
+        session: AsyncSession, table: str, columns: Sequence[str], records: Iterable[Sequence]
+) -> None:
+    """ COPY ... FROM STDIN in the session transaction """
+    connection = await get_driver_connection(session)
+    statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+        sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    async with connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for record in records:
+                await copy.write_row(record)
@@ -1,21 +1,230 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker, Session
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from fastapi import Depends
 from ..core.config import settings, Logger
-from typing import Annotated
+from ..core.metrics import (
+    registry, Gauge, record_statement, db_pool_checkout_wait, db_pool_checkout_timeouts
+)
+from typing import Annotated, AsyncIterator
 
-log = Logger(__name__, 'base.log').logger
+log = Logger(__name__, 'app/base.log').logger
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI), echo=True)
-sync_session_maker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """ Times how long a checkout waits for a free (or new) connection """
 
-class Base(DeclarativeBase):
-    pass
+    def _do_get(self):
+        # the overflow paths of QueuePool._do_get retry through self._do_get,
+        # those rare retries are observed twice
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
 
 
-async def get_session() -> AsyncSession:
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_statement(time.perf_counter() - conn.info['query_started'].pop())
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+def create_instrumented_engine(url: str) -> AsyncEngine:
+    instrumented = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+    event.listen(instrumented.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(instrumented.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(instrumented.sync_engine, 'handle_error', _handle_error)
+    return instrumented
+
+
+engine = create_instrumented_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+
+registry.register(Gauge(
+    'db_pool_connections', 'Connections of the primary pool by state.',
+    lambda: {
+        ('size',): engine.pool.size(),
+        ('checked_out',): engine.pool.checkedout(),
+        ('checked_in',): engine.pool.checkedin(),
+        ('overflow',): max(engine.pool.overflow(), 0),
+    },
+    labelnames=('state',),
+))
+registry.register(Gauge(
+    'db_pool_saturation', 'Checked out connections over pool_size + max_overflow.',
+    lambda: engine.pool.checkedout() / (engine.pool.size() + settings.POSTGRES_POOL_MAX_OVERFLOW),
+))
+
+async_session = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with async_session() as session:
+        yield session
+
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
+
+
+# seconds the replica is behind; 0 when it has replayed everything it received, infinite
+# when it is not streaming from the primary: received = replayed then only means it is cut off
+REPLICA_LAG = text(
+    'SELECT CASE'
+    "  WHEN NOT pg_is_in_recovery() THEN 0"
+    "  WHEN NOT EXISTS (SELECT FROM pg_stat_wal_receiver WHERE status = 'streaming')"
+    "    THEN CAST('Infinity' AS double precision)"
+    '  WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0'
+    '  ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)'
+    ' END'
+)
+
+
+class Replica:
+
+    def __init__(self, url: str) -> None:
+        url = make_url(url)
+        self.name = f'{url.host}:{url.port or 5432}'
+        self.engine = create_instrumented_engine(url.render_as_string(hide_password=False))
+        self.sessionmaker = async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        # unhealthy until the first check passes
+        self.healthy = False
+        self.lag: float | None = None
+
+
+class ReplicaRouter:
+    """
+    Round-robin over the replicas that answered the last health check and
+    are less than ``max_lag`` seconds behind; None means use the primary.
+    """
+
+    def __init__(self, urls: list[str], max_lag: float, interval: float) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.interval = interval
+        self._turn = itertools.count()
+        self._task: asyncio.Task | None = None
+
+    async def check_replica(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.interval):
+                async with replica.engine.connect() as connection:
+                    replica.lag = float(await connection.scalar(REPLICA_LAG))
+            healthy = replica.lag <= self.max_lag
+        except Exception as exc:
+            log.warning('Replica %s check failed: %r', replica.name, exc)
+            replica.lag, healthy = None, False
+        if healthy != replica.healthy:
+            log.warning('Replica %s is %s, lag %s', replica.name, 'up' if healthy else 'down', replica.lag)
+        replica.healthy = healthy
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def start(self) -> None:
+        if self.replicas:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def pick(self) -> Replica | None:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_failed(self, replica: Replica) -> None:
+        # until the next check brings it back
+        if replica.healthy:
+            log.warning('Replica %s is down, connection failed', replica.name)
+        replica.healthy = False
+
+
+replicas = ReplicaRouter(
+    settings.REPLICA_DATABASE_URIS, max_lag=settings.POSTGRES_REPLICA_MAX_LAG,
+    interval=settings.POSTGRES_REPLICA_CHECK_INTERVAL,
+)
+registry.register(Gauge(
+    'db_replica_healthy', 'Whether a replica receives reads.',
+    lambda: {(replica.name,): int(replica.healthy) for replica in replicas.replicas},
+    labelnames=('replica',),
+))
+registry.register(Gauge(
+    'db_replica_lag_seconds', 'Replication lag seen by the last health check, -1 when unreachable.',
+    lambda: {(replica.name,): -1 if replica.lag is None else replica.lag for replica in replicas.replicas},
+    labelnames=('replica',),
+))
+
+
+@asynccontextmanager
+async def read_session(execution_options: dict | None = None) -> AsyncIterator[AsyncSession]:
+    """
+    Session on a healthy replica, on the primary when there is none or it
+    cannot connect. The connection is taken up front, so ``execution_options``
+    such as an isolation level apply to it; set later they would be ignored
+    """
+    replica = replicas.pick()
+    if replica is not None:
+        session = replica.sessionmaker()
+        try:
+            await session.connection(execution_options=execution_options)
+        except (exc.DBAPIError, exc.TimeoutError, OSError):
+            # unreachable, or its pool is exhausted: the primary still serves the read
+            await session.close()
+            replicas.mark_failed(replica)
+        else:
+            async with session:
+                yield session
+            return
     async with async_session() as session:
+        await session.connection(execution_options=execution_options)
+        yield session
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    async with read_session() as session:
+        yield session
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+async def get_snapshot_session() -> AsyncIterator[AsyncSession]:
+    # every statement of the request sees the data as of its first one
+    async with read_session({'isolation_level': 'REPEATABLE READ'}) as session:
         yield session
 
-SessionDep = Annotated[AsyncSession, Depends(get_session)]
\ No newline at end of file
+SnapshotSessionDep = Annotated[AsyncSession, Depends(get_snapshot_session)]
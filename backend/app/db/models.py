@@ -3,10 +3,11 @@ from .database import settings
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 from sqlalchemy import (
     ForeignKey, PrimaryKeyConstraint, UniqueConstraint, ForeignKeyConstraint, CheckConstraint,
-    MetaData, Column
+    MetaData, Column, Index, text
 )
 from typing import Optional
-from sqlalchemy.types import Integer, String, DateTime, Boolean, Text, NUMERIC, Time
+from sqlalchemy.types import Integer, String, DateTime, Boolean, Text, NUMERIC, Time, Double, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
 import datetime
 from sqlalchemy import Enum as sqlalchemyEnum
 
@@ -48,6 +49,35 @@ class Users(Base):
         return f'<User>:{self.username}'
 
 
+class IdempotencyKeys(Base):
+    """ First responses of POSTs sent with an Idempotency-Key, shared by all workers """
+    __tablename__ = 'idempotency_keys'
+
+    key: Mapped['str'] = mapped_column(String(64), primary_key=True)
+    fingerprint: Mapped['str'] = mapped_column(String(64))
+    # NULL while the first request is still running
+    status: Mapped[Optional['int']] = mapped_column()
+    headers: Mapped[Optional['list']] = mapped_column(JSONB)
+    body: Mapped[Optional['bytes']] = mapped_column(LargeBinary)
+    # the request holding a pending row; it renews locked_until while it runs,
+    # so a pending row past it was abandoned by a crashed or killed worker
+    lock_owner: Mapped[Optional['str']] = mapped_column(String(32))
+    locked_until: Mapped[Optional['datetime.datetime']] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped['datetime.datetime'] = mapped_column(DateTime(timezone=True), index=True)
+
+
+class RateLimitBuckets(Base):
+    """ Token buckets shared by all workers; losing them on a crash only resets the limits """
+    __tablename__ = 'rate_limit_buckets'
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    key: Mapped['str'] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped['float'] = mapped_column(Double())
+    # whether the last take was granted
+    allowed: Mapped['bool'] = mapped_column()
+    updated_at: Mapped['datetime.datetime'] = mapped_column(DateTime(timezone=True), index=True)
+
+
 class Competitions(Base):
     __tablename__ = 'competitions'
 
@@ -56,13 +86,13 @@ class Competitions(Base):
     date: Mapped['datetime.datetime'] = mapped_column(DateTime(timezone=True))
     description: Mapped[Optional['str']] = mapped_column(Text(), nullable=True)
     contribution: Mapped[list['Contributions']] = relationship(
-        back_populates='competition', cascade='all, delete'
+        back_populates='competition', cascade='all, delete', passive_deletes=True
     )
     complex: Mapped[list['Complexes']] = relationship(
-        back_populates='competition', cascade='all, delete'
+        back_populates='competition', cascade='all, delete', passive_deletes=True
     )
     participant: Mapped[list['Participants']] = relationship(
-        back_populates='competition', cascade='all, delete'
+        back_populates='competition', cascade='all, delete', passive_deletes=True
     )
 
     def __repr__(self):
@@ -83,7 +113,7 @@ class Contributions(Base):
     )
     competition: Mapped['Competitions'] = relationship(back_populates='contribution')
     payment: Mapped[list['Payments']] = relationship(
-        back_populates='contribution', cascade='all, delete'
+        back_populates='contribution', cascade='all, delete', passive_deletes=True
     )
     mode: Mapped['Mode']
     price: Mapped['float'] = mapped_column(NUMERIC(10, 2))
@@ -98,17 +128,17 @@ class Participants(Base):
 
     id: Mapped['int'] = mapped_column(primary_key=True)
     competition_id: Mapped['int'] = mapped_column(
-        ForeignKey('competitions.id', ondelete='CASCADE')
+        ForeignKey('competitions.id', ondelete='CASCADE'), index=True
     )
     competition: Mapped['Competitions'] = relationship(back_populates='participant')
     payment: Mapped[list['Payments']] = relationship(
-        back_populates='participant', cascade='all, delete'
+        back_populates='participant', cascade='all, delete', passive_deletes=True
     )
     qualifying_video: Mapped[list['QualifyingVideos']] = relationship(
-        back_populates='participant', cascade='all, delete'
+        back_populates='participant', cascade='all, delete', passive_deletes=True
     )
     result: Mapped[list['Results']] = relationship(
-        back_populates='participant', cascade='all, delete'
+        back_populates='participant', cascade='all, delete', passive_deletes=True
     )
     fullname: Mapped['str'] = mapped_column(String(255))
     email: Mapped['str'] = mapped_column(String(255), unique=True)
@@ -132,7 +162,7 @@ class Payments(Base):
     )
     id: Mapped['int'] = mapped_column(primary_key=True)
     participant_id: Mapped['int'] = mapped_column(
-        ForeignKey('participants.id', ondelete='CASCADE')
+        ForeignKey('participants.id', ondelete='CASCADE'), index=True
     )
     participant: Mapped['Participants'] = relationship(back_populates='payment')
     competition_id: Mapped['int']
@@ -152,14 +182,14 @@ class Complexes(Base):
     id: Mapped['int'] = mapped_column(primary_key=True)
     name: Mapped['str'] = mapped_column(String(255))
     competition_id: Mapped['int'] = mapped_column(
-        ForeignKey('competitions.id', ondelete='CASCADE'),
+        ForeignKey('competitions.id', ondelete='CASCADE'), index=True
     )
     competition: Mapped['Competitions'] = relationship(back_populates='complex')
     qualifying_video: Mapped[list['QualifyingVideos']] = relationship(
-        back_populates='complex', cascade='all, delete'
+        back_populates='complex', cascade='all, delete', passive_deletes=True
     )
     result: Mapped[list['Results']] = relationship(
-        back_populates='complex', cascade='all, delete'
+        back_populates='complex', cascade='all, delete', passive_deletes=True
     )
     description: Mapped['str'] = mapped_column(Text())
     is_qualifying: Mapped['bool'] = mapped_column()
@@ -176,17 +206,25 @@ class QualifyingVideos(Base):
     __tablename__ = 'qualifying_videos'
     __table_args__ = (
         PrimaryKeyConstraint('complex_id', 'participant_id'),
+        # the review queue: only videos nobody has judged yet
+        Index(
+            'ix_qualifying_videos_pending', 'complex_id', 'participant_id',
+            postgresql_where=text('reviewed_at IS NULL')
+        ),
     )
     complex_id: Mapped['int'] = mapped_column(
         ForeignKey('complexes.id', ondelete='CASCADE')
     )
     complex: Mapped['Complexes'] = relationship(back_populates='qualifying_video')
     participant_id: Mapped['int'] = mapped_column(
-        ForeignKey('participants.id', ondelete='CASCADE')
+        ForeignKey('participants.id', ondelete='CASCADE'), index=True
     )
     participant: Mapped['Participants'] = relationship(back_populates='qualifying_video')
     video_url: Mapped['str'] = mapped_column(String(255))
     qualifier_status: Mapped['QualifierStatus'] = mapped_column(default=QualifierStatus.unqualified.value)
+    reviewed_at: Mapped[Optional['datetime.datetime']] = mapped_column(DateTime(timezone=True))
+    lease_owner: Mapped[Optional['str']] = mapped_column(String(255))
+    lease_expires_at: Mapped[Optional['datetime.datetime']] = mapped_column(DateTime(timezone=True))
 
 
 class ViewResult(str, enum.Enum):
@@ -203,14 +241,20 @@ class Results(Base):
         PrimaryKeyConstraint(
             'complex_id', 'participant_id'
         ),
+        Index('ix_results_complex_id_score', 'complex_id', 'score', 'tiebreak'),
     )
     complex_id: Mapped['int'] = mapped_column(
         ForeignKey('complexes.id', ondelete='CASCADE')
     )
     complex: Mapped['Complexes'] = relationship(back_populates='result')
     participant_id: Mapped['int'] = mapped_column(
-        ForeignKey('participants.id', ondelete='CASCADE')
+        ForeignKey('participants.id', ondelete='CASCADE'), index=True
     )
     participant: Mapped['Participants'] = relationship(back_populates='result')
     view: Mapped['ViewResult']
-    result: Mapped['str'] = mapped_column(String(255))
\ No newline at end of file
+    result: Mapped['str'] = mapped_column(String(255))
+    # normalized sort key from core.scoring, lower is better
+    score: Mapped['float'] = mapped_column(Double(), server_default=text("'Infinity'"))
+    tiebreak: Mapped['float'] = mapped_column(Double(), server_default=text("'Infinity'"))
+    # bumped by every correction, judges send the version they saw
+    version: Mapped['int'] = mapped_column(default=1, server_default=text('1'))
\ No newline at end of file
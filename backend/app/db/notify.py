@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Callable
+import psycopg
+from psycopg import sql
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings, Logger
+
+log = Logger(__name__, 'app/base.log').logger
+
+# identifies notifications published by this process
+WORKER_ID = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+Handler = Callable[[dict | None], None]
+
+
+async def notify(session: AsyncSession, channel: str, payload: dict):
+    """ NOTIFY inside the session transaction, delivered only if it commits """
+    await session.execute(
+        select(func.pg_notify(channel, json.dumps({**payload, 'origin': WORKER_ID})))
+    )
+
+
+def is_local(payload: dict) -> bool:
+    return payload.get('origin') == WORKER_ID
+
+
+class PgListener:
+    """
+    One LISTEN connection per worker dispatching notifications to handlers.
+
+    Handlers are called with the decoded payload, or with None after a
+    (re)connect, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self._dsn = dsn
+        self._handlers: dict[str, list[Handler]] = {}
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def start(self) -> None:
+        if self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self._dsn, autocommit=True) as conn:
+                    for channel in self._handlers:
+                        await conn.execute(sql.SQL('LISTEN {}').format(sql.Identifier(channel)))
+                    for channel in self._handlers:
+                        self._dispatch(channel, None)
+                    delay = 1
+                    async for notification in conn.notifies():
+                        self._dispatch(notification.channel, json.loads(notification.payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                log.warning(f'listener disconnected: {exc!r}, retry in {delay}s')
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _dispatch(self, channel: str, payload: dict | None) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                log.exception(f'{channel} handler failed')
+
+
+listener = PgListener(settings.PSYCOPG_DATABASE_URI)
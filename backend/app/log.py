@@ -1,15 +1,173 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+# Every Logger shares one sink: records are put on a queue from the caller
+# and formatted / written to LOG_FILE by a background thread, so a request
+# never waits on disk I/O. configure_logging points the sink at the
+# configured file.
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+LOG_FILE = 'app/base.log'
+LOG_LEVEL = logging.INFO
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+request_id: ContextVar[str | None] = ContextVar('request_id', default=None)
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """ Stamps the current request id, runs in the caller's context """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """ Lets through a ``rate`` share of records """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class _Sink:
+
+    def __init__(self) -> None:
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.path: str | None = None
+        self.file_handler: RotatingFileHandler | None = None
+        self.listener: QueueListener | None = None
+
+    def handler(self) -> QueueHandler:
+        handler = QueueHandler(self.queue)
+        handler.addFilter(RequestIdFilter())
+        return handler
+
+    def open(self, filename: str) -> None:
+        """ Write to ``filename`` from now on; queued records go to the previous file first """
+        path = os.path.abspath(filename)
+        if path == self.path:
+            return
+        self.close()
+        # delay: the file is only created once something is written to it
+        self.file_handler = RotatingFileHandler(
+            path, 'a', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+        )
+        self.file_handler.setFormatter(JSONFormatter())
+        self.listener = QueueListener(self.queue, self.file_handler)
+        self.listener.start()
+        self.path = path
+
+    def close(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.file_handler.close()
+        self.path = self.file_handler = self.listener = None
+
+
+_sink = _Sink()
+_handler = _sink.handler()
 
 
 class Logger:
-    def __init__(self, logname: str, filename: str) -> None:
+    """
+    ``logging.getLogger(logname)`` writing to the shared sink. ``filename``
+    is ignored: the file is LOG_FILE, or the one given to configure_logging.
+    """
+
+    def __init__(self, logname: str, filename: str | None = None) -> None:
         self.logger = logging.getLogger(logname)
-        self.logger.setLevel(logging.INFO)
-        self.handler = logging.FileHandler(filename,'a')
-        self.handler.setLevel(logging.INFO)
-        self.formatter = logging.Formatter('%(asctime)s:%(name)s: %(message)s', datefmt='%H:%M:%S')
-        self.handler.setFormatter(self.formatter)
-        self.logger.addHandler(self.handler)
+        self.logger.setLevel(LOG_LEVEL)
+        self.handler = _handler
+        if self.handler not in self.logger.handlers:
+            self.logger.addHandler(self.handler)
+        if _sink.path is None:
+            _sink.open(LOG_FILE)
+
+
+def configure_logging(
+        filename: str, level: str, max_bytes: int, backup_count: int,
+        sql_level: str, sql_sample_rate: float,
+) -> None:
+    """
+    Point the sink at ``filename``, apply the settings to every Logger and
+    route SQLAlchemy's engine log there too: INFO logs statements, DEBUG
+    also result rows, and only ``sql_sample_rate`` of them are kept.
+    """
+    global LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+    LOG_FILE, LOG_LEVEL = filename, logging.getLevelName(level)
+    LOG_MAX_BYTES, LOG_BACKUP_COUNT = max_bytes, backup_count
+
+    _sink.open(filename)
+    _sink.file_handler.maxBytes = max_bytes
+    _sink.file_handler.backupCount = backup_count
+    for logger in logging.Logger.manager.loggerDict.values():
+        if isinstance(logger, logging.Logger) and _handler in logger.handlers:
+            logger.setLevel(LOG_LEVEL)
+
+    sql_logger = logging.getLogger('sqlalchemy.engine')
+    sql_logger.setLevel(sql_level)
+    sql_logger.propagate = False
+    sql_handler = _sink.handler()
+    sql_handler.addFilter(SampleFilter(sql_sample_rate))
+    sql_logger.handlers = [sql_handler]
+
+
+@atexit.register
+def _flush() -> None:
+    _sink.close()
+
+
+class RequestIdMiddleware:
+    """ Binds ``X-Request-ID`` (or a fresh one) to the logs of a request and echoes it back """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
 
+        header = REQUEST_ID_HEADER.lower().encode()
+        value = next((v.decode('latin-1') for k, v in scope['headers'] if k == header), None)
+        value = value[:64] if value else uuid.uuid4().hex
+        token = request_id.set(value)
 
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', []), (header, value.encode('latin-1'))]
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -1,11 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, status
 from .api.main import api_router
-from .log import Logger
+from .api.routes.auth import auth_router
+from .api.crud.purge import stop_purge_jobs
+from .core.config import settings
+from .db.database import engine, replicas
+from .db.notify import listener
+from .core.metrics import MetricsMiddleware
+from .core.idempotency import IdempotencyMiddleware
+from .log import Logger, RequestIdMiddleware, configure_logging
 import sys
 
+configure_logging(
+    filename=settings.LOG_FILE, level=settings.LOG_LEVEL,
+    max_bytes=settings.LOG_MAX_BYTES, backup_count=settings.LOG_BACKUP_COUNT,
+    sql_level=settings.SQL_LOG_LEVEL, sql_sample_rate=settings.SQL_LOG_SAMPLE_RATE,
+)
 log = Logger(logname=__name__,filename='app/base.log').logger
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await listener.start()
+    await replicas.start()
+    yield
+    await stop_purge_jobs()
+    await replicas.stop()
+    await listener.stop()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+# the login answers with a bearer token, which must not be kept around for replays
+app.add_middleware(IdempotencyMiddleware, exclude=[route.path for route in auth_router.routes])
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 app.include_router(api_router)
 
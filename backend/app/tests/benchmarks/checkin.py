@@ -0,0 +1,131 @@
+"""
+Per-scan latency of event-day check-in with several desks scanning at once.
+
+Desks check in the athletes of the latest synthetic competition
+(``app.cli.generate_dataset``) by id, email or QR token, with a share of
+repeated scans. Afterwards one desk replays its whole queue as an offline
+batch. Arrivals are reset before and after the run.
+
+    python -m app.tests.benchmarks.checkin --desks 8 --scans 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+from sqlalchemy import select, update
+
+from ...cli import generate_dataset
+from ...core.config import settings
+from ...core.security import create_checkin_token
+from ...db.database import async_session, engine
+from ...db.models import Competitions, Participants
+from ...main import app
+from .seed import seed_user
+from .stats import latency_summary
+
+
+USERNAME = 'checkin-desk'
+PASSWORD = 'checkin-desk'
+
+
+async def reset(competition_id: int) -> None:
+    async with async_session() as session:
+        await session.execute(
+            update(Participants).where(Participants.competition_id == competition_id).values(is_arrived=False)
+        )
+        await session.commit()
+
+
+def scan(rng: random.Random, participant: tuple[int, str], competition_id: int) -> dict:
+    participant_id, email = participant
+    kind = rng.choice(('participant_id', 'email', 'token'))
+    if kind == 'participant_id':
+        return {'participant_id': participant_id}
+    if kind == 'email':
+        return {'email': email}
+    return {'token': create_checkin_token(participant_id, competition_id)}
+
+
+async def desk(client: httpx.AsyncClient, competition_id: int, queue: list[dict], latencies: list, statuses: dict):
+    for body in queue:
+        started = time.perf_counter()
+        response = await client.post('/participants/checkin', params={'competition_id': competition_id}, json=body)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        status = response.json()['status']
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def main(desks: int, scans: int, repeats: float, seed: int):
+    rng = random.Random(seed)
+    await seed_user(USERNAME, PASSWORD)
+    async with async_session() as session:
+        competition_id = await session.scalar(
+            select(Competitions.id).where(Competitions.name.startswith(generate_dataset.NAME_PREFIX))
+            .order_by(Competitions.id.desc()).limit(1)
+        )
+        if competition_id is None:
+            raise SystemExit('No synthetic competition, run app.cli.generate_dataset first')
+        participants = (await session.execute(
+            select(Participants.id, Participants.email).where(Participants.competition_id == competition_id)
+        )).all()
+
+    sample = rng.sample(participants, min(scans, len(participants)))
+    queue = [scan(rng, participant, competition_id) for participant in sample]
+    queue += [dict(rng.choice(queue)) for _ in range(round(len(queue) * repeats))]
+    rng.shuffle(queue)
+    queues = [queue[index::desks] for index in range(desks)]
+
+    await reset(competition_id)
+    # all desks share one account, the per-user limits would pace them
+    settings.RATE_LIMIT_ENABLED = False
+    latencies, statuses = [], {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=60) as client:
+            response = await client.post('/token', data={'username': USERNAME, 'password': PASSWORD})
+            response.raise_for_status()
+            client.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+
+            started = time.perf_counter()
+            await asyncio.gather(*(desk(client, competition_id, scans, latencies, statuses) for scans in queues))
+            elapsed = time.perf_counter() - started
+
+            # the same desk comes back online and replays everything it queued
+            replayed, limit = {}, settings.CHECKIN_BATCH_LIMIT
+            started = time.perf_counter()
+            for offset in range(0, len(queues[0]), limit):
+                response = await client.post(
+                    '/participants/checkin/batch', params={'competition_id': competition_id},
+                    json=queues[0][offset:offset + limit]
+                )
+                response.raise_for_status()
+                for item in response.json():
+                    replayed[item['status']] = replayed.get(item['status'], 0) + 1
+            replay = time.perf_counter() - started
+    finally:
+        await reset(competition_id)
+        await engine.dispose()
+
+    print(json.dumps({
+        'competition_id': competition_id,
+        'desks': desks,
+        'scans': len(queue),
+        'scans_per_second': round(len(queue) / elapsed, 1),
+        'statuses': statuses,
+        'scan_ms': latency_summary(latencies),
+        'replay': {'scans': len(queues[0]), 'ms': round(replay * 1000, 1), 'statuses': replayed},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--desks', type=int, default=8)
+    parser.add_argument('--scans', type=int, default=2000, help='distinct athletes scanned')
+    parser.add_argument('--repeats', type=float, default=0.1, help='share of scans repeated')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.desks, args.scans, args.repeats, args.seed))
@@ -0,0 +1,87 @@
+"""
+Concurrent-request throughput of the data layer.
+
+Runs the same round-trip (a simulated server-side latency plus a read of
+``competitions``) from many concurrent coroutines, once through a blocking
+``create_engine`` session the way the handlers used to, and once through the
+``AsyncSession`` from ``db/database.py``.
+
+    python -m app.tests.benchmarks.db_concurrency --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from ...core.config import settings
+from ...db.database import async_session, engine
+from ...db.models import Competitions
+
+
+QUERY_DELAY = text('SELECT pg_sleep(:delay)')
+
+
+def blocking_round_trip(session_maker, delay: float):
+    with session_maker() as session:
+        session.execute(QUERY_DELAY, {'delay': delay})
+        session.scalars(select(Competitions).limit(10)).all()
+
+
+async def async_round_trip(delay: float):
+    async with async_session() as session:
+        await session.execute(QUERY_DELAY, {'delay': delay})
+        (await session.scalars(select(Competitions).limit(10))).all()
+
+
+async def run(requests: int, concurrency: int, make_call) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            await make_call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {'seconds': round(elapsed, 3), 'rps': round(requests / elapsed, 1)}
+
+
+async def main(requests: int, concurrency: int, delay: float):
+    sync_engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_POOL_MAX_OVERFLOW,
+    )
+    sync_session_maker = sessionmaker(bind=sync_engine)
+
+    async def blocking_call():
+        # the pre-async handlers ran sync CRUD directly on the event loop
+        blocking_round_trip(sync_session_maker, delay)
+
+    async def async_call():
+        await async_round_trip(delay)
+
+    report = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'query_delay': delay,
+        'blocking': await run(requests, concurrency, blocking_call),
+        'async': await run(requests, concurrency, async_call),
+    }
+    report['speedup'] = round(report['async']['rps'] / report['blocking']['rps'], 2)
+
+    sync_engine.dispose()
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.005, help='simulated query latency, seconds')
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.delay))
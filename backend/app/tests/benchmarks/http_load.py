@@ -0,0 +1,372 @@
+"""
+HTTP load test of every router with per-endpoint throughput and latency.
+
+Without ``--base-url`` the app is booted with uvicorn against the database
+from the settings and a superuser is seeded straight into it. A fresh
+competition with complexes, participants and results is created through
+the API, a weighted mix of requests is replayed by concurrent clients for
+``--duration`` seconds, and everything created is deleted afterwards.
+
+    python -m app.tests.benchmarks.http_load --duration 30 --concurrency 32 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from ...core.config import settings
+from ...db.database import engine
+from .seed import seed_user
+from .stats import latency_summary
+
+
+USERNAME = 'http-load'
+PASSWORD = 'http-load'
+COMPLEXES = (
+    # name, is_qualifying, view of the seeded results
+    ('Snatch', True, 'kg'),
+    ('Fran', False, 'min'),
+    ('Live', False, 'reps'),
+)
+
+
+class Fixture:
+    """ Ids created by ``seed`` and the not yet used pairs the write requests consume """
+
+    def __init__(self, tag: str, headers: dict) -> None:
+        self.tag = tag
+        self.headers = headers
+        self.competition_id = None
+        self.complex_ids: dict[str, int] = {}
+        self.participant_ids: list[int] = []
+        self.competitions: list[int] = []
+        self.sequence = 0
+        self.without_video: list[int] = []
+        self.without_result: list[int] = []
+
+    def next(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+
+async def seed(client: httpx.AsyncClient, fixture: Fixture, participants: int) -> None:
+    headers = fixture.headers
+    response = await client.post('/competitions/', headers=headers, json={
+        'name': f'load-{fixture.tag}', 'date': '2026-10-18T09:00:00Z', 'description': 'http_load'
+    })
+    response.raise_for_status()
+    fixture.competition_id = response.json()['id']
+    fixture.competitions.append(fixture.competition_id)
+    params = {'competition_id': fixture.competition_id}
+
+    for mode in ('partial', 'full'):
+        (await client.post('/contributions/', params=params, headers=headers, json={
+            'price': 50, 'mode': mode
+        })).raise_for_status()
+    for name, is_qualifying, _ in COMPLEXES:
+        response = await client.post('/complexes/', params=params, headers=headers, json={
+            'name': name, 'description': name, 'is_qualifying': is_qualifying,
+            'start_time': '10:00:00Z', 'end_time': '11:00:00Z'
+        })
+        response.raise_for_status()
+        fixture.complex_ids[name] = response.json()['id']
+
+    batch = [
+        {'fullname': f'Athlete {i}', 'email': f'{fixture.tag}-{i}@load.test'} for i in range(participants)
+    ]
+    response = await client.post('/participants/batch', params=params, headers=headers, json=batch)
+    response.raise_for_status()
+    fixture.participant_ids = [item['participant']['id'] for item in response.json()]
+    fixture.without_video = list(fixture.participant_ids)
+    fixture.without_result = list(fixture.participant_ids)
+
+    rng = random.Random(0)
+    for name, _, view in COMPLEXES[:2]:
+        lines = ['participant_id,view,result']
+        for participant_id in fixture.participant_ids:
+            value = f'{rng.randint(2, 9)}:{rng.randint(0, 59):02}' if view == 'min' else str(rng.randint(40, 140))
+            lines.append(f'{participant_id},{view},{value}')
+        response = await client.post(
+            '/results/import', params={'complex_id': fixture.complex_ids[name], 'format': 'csv'},
+            headers=headers, files={'file': ('results.csv', '\n'.join(lines).encode(), 'text/csv')}
+        )
+        response.raise_for_status()
+
+
+# Every operation returns the response, or None when it has nothing left to do.
+
+async def login(client, fixture, rng):
+    return await client.post('/token', data={'username': USERNAME, 'password': PASSWORD})
+
+
+async def users_me(client, fixture, rng):
+    return await client.get('/users/me', headers=fixture.headers)
+
+
+async def competitions_list(client, fixture, rng):
+    return await client.get('/competitions/', params={'limit': 50}, headers=fixture.headers)
+
+
+async def competition_get(client, fixture, rng):
+    return await client.get(f'/competitions/{fixture.competition_id}', headers=fixture.headers)
+
+
+async def competition_create(client, fixture, rng):
+    response = await client.post('/competitions/', headers=fixture.headers, json={
+        'name': f'load-{fixture.tag}-{fixture.next()}', 'date': '2026-10-18T09:00:00Z'
+    })
+    if response.status_code == 200:
+        fixture.competitions.append(response.json()['id'])
+    return response
+
+
+async def contributions_list(client, fixture, rng):
+    return await client.get(
+        '/contributions/', params={'competition_id': fixture.competition_id}, headers=fixture.headers
+    )
+
+
+async def contribution_update(client, fixture, rng):
+    return await client.put(
+        '/contributions/',
+        params={'competition_id': fixture.competition_id, 'contribution_mode': 'partial'},
+        headers=fixture.headers, json={'price': rng.randint(40, 60)}
+    )
+
+
+async def complexes_list(client, fixture, rng):
+    return await client.get(
+        '/complexes/', params={'competition_id': fixture.competition_id}, headers=fixture.headers
+    )
+
+
+async def participants_list(client, fixture, rng):
+    return await client.get(
+        '/participants/', params={'competition_id': fixture.competition_id, 'limit': 100},
+        headers=fixture.headers
+    )
+
+
+async def participant_create(client, fixture, rng):
+    return await client.post(
+        '/participants/', params={'competition_id': fixture.competition_id}, headers=fixture.headers,
+        json={'fullname': 'Walk-in', 'email': f'{fixture.tag}-walkin-{fixture.next()}@load.test'}
+    )
+
+
+async def qualifying_create(client, fixture, rng):
+    if not fixture.without_video:
+        return None
+    participant_id = fixture.without_video.pop()
+    return await client.post(
+        '/qualifying/',
+        params={'complex_id': fixture.complex_ids['Snatch'], 'participant_id': participant_id},
+        headers=fixture.headers, json={'video_url': f'https://video.test/{participant_id}'}
+    )
+
+
+async def result_create(client, fixture, rng):
+    if not fixture.without_result:
+        return None
+    participant_id = fixture.without_result.pop()
+    return await client.post(
+        '/results/',
+        params={'complex_id': fixture.complex_ids['Live'], 'participant_id': participant_id},
+        headers=fixture.headers, json={'view': 'reps', 'result': str(rng.randint(10, 200))}
+    )
+
+
+async def results_list(client, fixture, rng):
+    return await client.get(
+        '/results/', params={'complex_id': fixture.complex_ids['Fran'], 'order': 'rank', 'limit': 100},
+        headers=fixture.headers
+    )
+
+
+async def complex_leaderboard(client, fixture, rng):
+    return await client.get(
+        '/leaderboard/complexes', params={'complex_id': fixture.complex_ids['Snatch']},
+        headers=fixture.headers
+    )
+
+
+async def competition_leaderboard(client, fixture, rng):
+    return await client.get(
+        '/leaderboard/', params={'competition_id': fixture.competition_id}, headers=fixture.headers
+    )
+
+
+# name, weight, operation: roughly the mix of an event day, reads dominate
+WORKLOAD = (
+    ('POST /token', 1, login),
+    ('GET /users/me', 4, users_me),
+    ('GET /competitions/', 4, competitions_list),
+    ('GET /competitions/{id}', 4, competition_get),
+    ('POST /competitions/', 1, competition_create),
+    ('GET /contributions/', 3, contributions_list),
+    ('PUT /contributions/', 1, contribution_update),
+    ('GET /complexes/', 3, complexes_list),
+    ('GET /participants/', 5, participants_list),
+    ('POST /participants/', 2, participant_create),
+    ('POST /qualifying/', 2, qualifying_create),
+    ('POST /results/', 3, result_create),
+    ('GET /results/', 5, results_list),
+    ('GET /leaderboard/complexes', 5, complex_leaderboard),
+    ('GET /leaderboard/', 3, competition_leaderboard),
+)
+
+
+async def drive(client: httpx.AsyncClient, fixture: Fixture, duration: float, concurrency: int, seed: int) -> dict:
+    names = [name for name, _, _ in WORKLOAD]
+    weights = [weight for _, weight, _ in WORKLOAD]
+    operations = {name: operation for name, _, operation in WORKLOAD}
+    latencies = {name: [] for name in names}
+    errors = {name: {} for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker(number: int):
+        rng = random.Random(seed * 1000 + number)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await operations[name](client, fixture, rng)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            else:
+                if response is None:
+                    continue
+                status = response.status_code
+            latencies[name].append(time.perf_counter() - started)
+            if status not in (200, 201):
+                errors[name][str(status)] = errors[name].get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {
+        name: {
+            'requests': len(latencies[name]),
+            'errors': errors[name],
+            'rps': round(len(latencies[name]) / elapsed, 1),
+            'latency_ms': latency_summary(latencies[name]),
+        }
+        for name in names
+    }
+    every = [latency for name in names for latency in latencies[name]]
+    return {
+        'seconds': round(elapsed, 3),
+        'total': {
+            'requests': len(every),
+            'errors': sum(sum(counts.values()) for counts in errors.values()),
+            'rps': round(len(every) / elapsed, 1),
+            'latency_ms': latency_summary(every),
+        },
+        'endpoints': endpoints,
+    }
+
+
+async def cleanup(client: httpx.AsyncClient, fixture: Fixture) -> None:
+    for competition_id in fixture.competitions:
+        await client.delete('/competitions/', params={'competition_id': competition_id}, headers=fixture.headers)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def serve(workers: int) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        # measuring throughput, not the per-user limits
+        env={**os.environ, 'PYTHONPATH': os.getcwd(), 'RATE_LIMIT_ENABLED': 'false'},
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(300):
+            if server.poll() is not None:
+                raise RuntimeError(f'uvicorn exited with {server.returncode}')
+            try:
+                if (await client.get('/metrics')).status_code == 200:
+                    return server, base_url
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('uvicorn did not start in 30s')
+
+
+async def main(args: argparse.Namespace) -> dict:
+    server = None
+    base_url, username, password = args.base_url, args.username, args.password
+    if base_url is None:
+        username, password = USERNAME, PASSWORD
+        await seed_user(username, password, is_superuser=True)
+        await engine.dispose()
+        server, base_url = await serve(args.workers)
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            response = await client.post('/token', data={'username': username, 'password': password})
+            response.raise_for_status()
+            headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+            fixture = Fixture(tag=uuid.uuid4().hex[:8], headers=headers)
+            try:
+                await seed(client, fixture, args.participants)
+                if args.warmup:
+                    await drive(client, fixture, args.warmup, args.concurrency, args.seed)
+                report = await drive(client, fixture, args.duration, args.concurrency, args.seed)
+            finally:
+                if not args.keep:
+                    await cleanup(client, fixture)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return {
+        'base_url': base_url,
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'workers': args.workers if server is not None else None,
+        'participants': args.participants,
+        'seed': args.seed,
+        **report,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--base-url', help='running server to target, boots uvicorn when omitted')
+    parser.add_argument('--username', default=settings.SUPERUSER_USERNAME, help='superuser of --base-url')
+    parser.add_argument('--password', default=settings.SUPERUSER_PASSWORD)
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers when booting the app')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unmeasured load first')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--participants', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='do not delete the seeded competitions')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    report = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    print(report)
@@ -0,0 +1,121 @@
+"""
+Latency of a cheap endpoint while ``/token`` is under a login storm.
+
+A probe keeps calling ``GET /users/me`` while many concurrent logins run
+bcrypt. With hashing off the loop the probe latency stays close to its idle
+baseline; ``--inline`` runs bcrypt on the event loop as the handlers used
+to, for comparison.
+
+    python -m app.tests.benchmarks.login_storm --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from ...core import security
+from ...db.database import engine
+from ...main import app
+from .seed import seed_user
+from .stats import latency_summary
+
+
+USERNAME = 'login-storm'
+PASSWORD = 'login-storm'
+
+
+async def login(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post('/token', data={'username': USERNAME, 'password': PASSWORD})
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get('/users/me', headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def request():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await login(client)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    return {
+        'seconds': round(elapsed, 3),
+        'logins_per_second': round(logins / elapsed, 1),
+        'statuses': statuses,
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+async def main(base_url: str | None, logins: int, concurrency: int, interval: float, baseline: float, inline: bool):
+    if inline:
+        async def run_inline(self, func, *args):
+            return func(*args)
+        security.PasswordHasher._run = run_inline
+
+    if base_url:
+        transport = None
+    else:
+        # the storm is one client logging in as one user, the limits would turn it away
+        security.settings.RATE_LIMIT_ENABLED = False
+        await seed_user(USERNAME, PASSWORD)
+        transport = httpx.ASGITransport(app=app)
+        base_url = 'http://benchmark'
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+        response = await login(client)
+        response.raise_for_status()
+        headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+        stop = asyncio.Event()
+        idle = asyncio.create_task(probe(client, headers, stop, interval))
+        await asyncio.sleep(baseline)
+        stop.set()
+        idle_latencies = await idle
+
+        stop = asyncio.Event()
+        busy = asyncio.create_task(probe(client, headers, stop, interval))
+        report = await storm(client, logins, concurrency)
+        stop.set()
+        busy_latencies = await busy
+
+    report = {
+        'mode': 'inline' if inline else 'pool',
+        'logins': logins,
+        'concurrency': concurrency,
+        'hash_workers': security.settings.PASSWORD_HASH_WORKERS,
+        'hash_max_pending': security.settings.PASSWORD_HASH_MAX_PENDING,
+        'login': report,
+        'probe_idle_ms': latency_summary(idle_latencies),
+        'probe_during_storm_ms': latency_summary(busy_latencies),
+    }
+    await engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--base-url', help='running server to target, in-process app when omitted')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.01, help='pause between probe requests, seconds')
+    parser.add_argument('--baseline', type=float, default=1.0, help='idle probe duration, seconds')
+    parser.add_argument('--inline', action='store_true', help='run bcrypt on the event loop (in-process only)')
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.logins, args.concurrency, args.interval, args.baseline, args.inline))
@@ -0,0 +1,99 @@
+"""
+Claim throughput of the qualifying review queue as judges are added.
+
+Every judge loops lease → verdict over the qualifying videos of the latest
+synthetic competition (``app.cli.generate_dataset``), whose review state is
+reset before each run. A video reviewed twice or a refused verdict is a bug
+and is reported next to the throughput.
+
+    python -m app.tests.benchmarks.review_queue --judges 1 8 32 --reviews 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select, update
+
+from ...api.crud.participants import (
+    lease_qualification_video_from_db, review_qualification_video_from_db, LeaseLost
+)
+from ...cli import generate_dataset
+from ...db.database import async_session, engine
+from ...db.models import Competitions, Complexes, QualifierStatus, QualifyingVideos
+from .stats import latency_summary
+
+
+async def reset(competition_id: int) -> None:
+    async with async_session() as session:
+        await session.execute(
+            update(QualifyingVideos)
+            .where(QualifyingVideos.complex_id.in_(
+                select(Complexes.id).where(Complexes.competition_id == competition_id)
+            ))
+            .values(reviewed_at=None, lease_owner=None, lease_expires_at=None)
+        )
+        await session.commit()
+
+
+async def judge(name: str, competition_id: int, budget: list[int], reviewed: list, latencies: list) -> int:
+    lost = 0
+    while budget[0] > 0:
+        budget[0] -= 1
+        started = time.perf_counter()
+        async with async_session() as session:
+            video = await lease_qualification_video_from_db(name, session, competition_id=competition_id)
+        latencies.append(time.perf_counter() - started)
+        if video is None:
+            break
+        try:
+            async with async_session() as session:
+                await review_qualification_video_from_db(
+                    video.complex_id, video.participant_id, name, QualifierStatus.qualified, session
+                )
+        except LeaseLost:
+            lost += 1
+        reviewed.append((video.complex_id, video.participant_id))
+    return lost
+
+
+async def run(competition_id: int, judges: int, reviews: int) -> dict:
+    await reset(competition_id)
+    budget, reviewed, latencies = [reviews], [], []
+    started = time.perf_counter()
+    lost = await asyncio.gather(*(
+        judge(f'judge-{index}', competition_id, budget, reviewed, latencies) for index in range(judges)
+    ))
+    elapsed = time.perf_counter() - started
+    return {
+        'judges': judges,
+        'reviews': len(reviewed),
+        'reviews_per_second': round(len(reviewed) / elapsed, 1),
+        'duplicates': len(reviewed) - len(set(reviewed)),
+        'leases_lost': sum(lost),
+        'claim_ms': latency_summary(latencies),
+    }
+
+
+async def main(judges: list[int], reviews: int):
+    try:
+        async with async_session() as session:
+            competition_id = await session.scalar(
+                select(Competitions.id).where(Competitions.name.startswith(generate_dataset.NAME_PREFIX))
+                .order_by(Competitions.id.desc()).limit(1)
+            )
+        if competition_id is None:
+            raise SystemExit('No synthetic competition, run app.cli.generate_dataset first')
+        report = [await run(competition_id, count, reviews) for count in judges]
+        await reset(competition_id)
+    finally:
+        await engine.dispose()
+    print(json.dumps({'competition_id': competition_id, 'runs': report}, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--judges', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--reviews', type=int, default=2000, help='videos reviewed per run')
+    args = parser.parse_args()
+    asyncio.run(main(args.judges, args.reviews))
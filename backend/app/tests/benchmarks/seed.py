@@ -0,0 +1,20 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ...core.security import get_password_hash
+from ...db.database import async_session
+from ...db.models import Users
+
+
+async def seed_user(username: str, password: str, is_superuser: bool = False) -> None:
+    """ Create the user or reset its password, straight in the database """
+    password_hash = get_password_hash(password)
+    async with async_session() as session:
+        await session.execute(
+            pg_insert(Users)
+            .values(username=username, password=password_hash, is_superuser=is_superuser)
+            .on_conflict_do_update(
+                index_elements=[Users.username],
+                set_={'password': password_hash, 'is_superuser': is_superuser}
+            )
+        )
+        await session.commit()
@@ -0,0 +1,21 @@
+import statistics
+from typing import Sequence
+
+
+def latency_summary(samples: Sequence[float]) -> dict:
+    """ count, mean and p50/p95/p99 of latencies in seconds, reported in ms """
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.fmean(ordered) * 1000, 2),
+        'p50': percentile(0.50),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': round(ordered[-1] * 1000, 2),
+    }
@@ -0,0 +1,23 @@
+import pytest
+
+
+class Clock:
+    """ Stands in for time.monotonic, tests move ``now`` by hand """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def patch_clock(monkeypatch):
+    """ ``patch_clock(module)`` gives ``module`` a Clock as time.monotonic and returns it """
+
+    def patch(module) -> Clock:
+        clock = Clock()
+        monkeypatch.setattr(module.time, 'monotonic', clock)
+        return clock
+
+    return patch
@@ -0,0 +1,70 @@
+import pytest
+
+from ..core import cache
+from ..core.cache import SortedStandings, TTLCache
+
+
+@pytest.fixture
+def clock(patch_clock):
+    return patch_clock(cache)
+
+
+def test_get_set_and_stats(clock):
+    ttl_cache = TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set('a', 1)
+    assert ttl_cache.get('a') == 1
+    assert ttl_cache.get('b', 'missing') == 'missing'
+    # membership does not count as a lookup
+    assert 'a' in ttl_cache
+    assert ttl_cache.stats() == {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_least_recently_used_is_evicted(clock):
+    ttl_cache = TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+    ttl_cache.get('a')
+    ttl_cache.set('c', 3)
+    assert 'b' not in ttl_cache
+    assert ttl_cache.get('a') == 1 and ttl_cache.get('c') == 3
+    assert ttl_cache.evictions == 1
+
+
+def test_entries_expire(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    ttl_cache.set('default', 1)
+    ttl_cache.set('short', 2, ttl=2)
+    # a per-entry ttl never outlives the cache's own
+    ttl_cache.set('long', 3, ttl=60)
+    clock.now += 5
+    assert ttl_cache.get('short') is None
+    assert ttl_cache.get('default') == 1
+    clock.now += 6
+    assert ttl_cache.get('default') is None
+    assert ttl_cache.get('long') is None
+    assert len(ttl_cache) == 0
+
+
+def test_pop_and_pop_where(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    for key in [(1, 'a'), (1, 'b'), (2, 'a')]:
+        ttl_cache.set(key, key)
+    assert ttl_cache.pop((2, 'a')) == (2, 'a')
+    assert ttl_cache.pop((2, 'a'), 'gone') == 'gone'
+    assert ttl_cache.pop_where(lambda key: key[0] == 1) == 2
+    assert len(ttl_cache) == 0
+
+
+def test_sorted_standings_reposition_and_places():
+    standings = SortedStandings([
+        {'participant_id': 1, 'score': -100.0, 'tiebreak': 0.0},
+        {'participant_id': 2, 'score': -90.0, 'tiebreak': 0.0},
+        {'participant_id': 3, 'score': -90.0, 'tiebreak': 0.0},
+    ])
+    assert [(row['participant_id'], row['place']) for row in standings.ranked()] == [(1, 1), (2, 2), (3, 2)]
+
+    standings.upsert({'participant_id': 3, 'score': -120.0, 'tiebreak': 0.0})
+    standings.remove(1)
+    standings.remove(42)
+    assert [(row['participant_id'], row['place']) for row in standings.ranked()] == [(3, 1), (2, 2)]
+    assert len(standings) == 2
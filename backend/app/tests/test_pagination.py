@@ -0,0 +1,67 @@
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+
+from ..api.dependencies.pagination import NEXT_CURSOR_HEADER, Page, decode_cursor, encode_cursor
+from ..db.models import Competitions, Contributions, Mode, Results
+
+
+@pytest.mark.parametrize('values', [
+    [1],
+    [-100.5, 270.0, 42],
+    ['2026-10-18T10:00:00+00:00', 'Ünïcödé name', 7],
+    [None, True, 0],
+])
+def test_cursor_round_trip(values):
+    cursor = encode_cursor(values)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == values
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', 'bm90IGpzb24', 'e30', 'W10'])
+def test_invalid_cursor_is_a_400(cursor):
+    # "not json", {} and []: none of them can position a page
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
+
+
+def test_paginate_announces_the_last_row_of_a_full_page():
+    page = Page(limit=2)
+    response = Response()
+    rows = page.paginate(response, [(1, 'a'), (2, 'b'), (3, 'c')], key=lambda row: row)
+    assert rows == [(1, 'a'), (2, 'b')]
+    assert Page(after=response.headers[NEXT_CURSOR_HEADER], limit=2).after == [2, 'b']
+
+
+def test_last_page_has_no_cursor():
+    response = Response()
+    assert Page(limit=2).paginate(response, [(1,)], key=lambda row: row) == [(1,)]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def keyset(values, *columns):
+    return Page(after=encode_cursor(values)).keyset(select(*columns), *columns)
+
+
+def test_keyset_binds_cursor_values_as_column_types():
+    query = keyset(['full'], Contributions.mode)
+    assert query.compile().params['param_1'] is Mode.full
+    # JSON has no float for 3.0, the score column still gets one
+    params = keyset([3, float('inf'), 7], Results.score, Results.tiebreak, Results.participant_id).compile().params
+    assert list(params.values())[:3] == [3.0, float('inf'), 7]
+
+
+@pytest.mark.parametrize('values, columns', [
+    (['bogus'], (Contributions.mode,)),
+    (['abc'], (Competitions.id,)),
+    ([1.5], (Competitions.id,)),
+    ([True], (Competitions.id,)),
+    ([None], (Competitions.id,)),
+    (['1', 2, 3], (Results.score, Results.tiebreak, Results.participant_id)),
+    ([1, 2], (Competitions.id,)),
+])
+def test_cursor_of_another_ordering_is_a_400(values, columns):
+    with pytest.raises(HTTPException) as exc_info:
+        keyset(values, *columns)
+    assert exc_info.value.status_code == 400
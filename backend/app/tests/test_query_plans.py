@@ -0,0 +1,226 @@
+"""
+Fail when a CRUD query plans a sequential scan over a large table.
+
+Every query path in ``api/crud`` is run against a seeded dataset (generated
+with ``app.cli.generate_dataset`` when missing), the SQL it sends is
+captured, and each statement is EXPLAINed with its parameters. Writes run
+inside a transaction that is rolled back, so the dataset stays as seeded.
+Skipped when the database is not reachable.
+
+Not covered: the COPY of the bulk import and dataset generation (COPY has no
+plan), and the final ORM delete of a purge, which the participant cases
+already cover.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event, exc, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..api.crud.auth import get_user_from_db
+from ..api.crud.competitions import (
+    get_competition_from_db, get_competition_snapshot_from_db, get_competition_version_from_db,
+    get_all_competition_from_db, get_contributions_from_db, get_all_complexes_from_db,
+    get_all_result_complexes_from_db, correct_results_from_db
+)
+from ..api.crud.export import participants_export_query, results_export_query
+from ..api.crud.leaderboard import (
+    get_complex_leaderboard_from_db, get_competition_leaderboard_from_db, leaderboard_cache
+)
+from ..api.crud.participants import (
+    get_all_participants_from_db, check_in_participants_from_db, lease_qualification_video_from_db,
+    qualify_participants_from_db
+)
+from ..api.crud.purge import PURGE_STEPS, purge_chunk
+from ..api.crud.results_import import import_results_from_db
+from ..api.dependencies.pagination import Page
+from ..api.schemas.competitions import ResultCorrection, ResultOrder
+from ..api.schemas.participants import CheckIn
+from ..cli import generate_dataset
+from ..core.config import settings
+from ..db.database import async_session, engine
+from ..db.models import Competitions, Complexes, Participants, Users, ViewResult
+
+
+# many mid-sized competitions, like the database collects over the seasons: with only a
+# few, one competition is a large share of every table and scanning it is the right plan
+COMPETITIONS = 40
+PARTICIPANTS = 500
+SEED = 1
+# smaller tables may be scanned
+MIN_ROWS = 10000
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+class Dataset:
+    """ Rows of the seeded dataset the cases run against """
+
+    def __init__(self, large: set[str], competition_id: int, complex_id: int, participant_id: int,
+                 email: str, username: str) -> None:
+        self.large = large
+        self.competition_id = competition_id
+        self.complex_id = complex_id
+        self.participant_id = participant_id
+        self.email = email
+        self.username = username
+
+
+async def participant_children(participant_id: int, session):
+    # what the ORM cascades load per participant when a competition is deleted
+    return (await session.scalars(
+        select(Participants)
+        .options(
+            selectinload(Participants.payment), selectinload(Participants.result),
+            selectinload(Participants.qualifying_video)
+        )
+        .where(Participants.id == participant_id)
+    )).one()
+
+
+async def participant_delete(participant_id: int, session):
+    participant = await session.get_one(Participants, participant_id)
+    await session.delete(participant)
+    await session.flush()
+
+
+async def purge_chunks(competition_id: int, session):
+    params = {'competition_id': competition_id, 'chunk': settings.PURGE_CHUNK_SIZE}
+    for table, where in PURGE_STEPS:
+        await session.scalar(text(f'SELECT count(*) FROM {table} WHERE {where}'), params)
+        await session.execute(purge_chunk(table, where), params)
+
+
+# (name, coroutine function taking the dataset and a session) for every query path
+CASES = {
+    'competition': lambda d, s: get_competition_from_db(d.competition_id, s),
+    'competition snapshot': lambda d, s: get_competition_snapshot_from_db(d.competition_id, s),
+    'competition version': lambda d, s: get_competition_version_from_db(d.competition_id, s),
+    'competitions page': lambda d, s: get_all_competition_from_db(s, Page(limit=100)),
+    'contributions': lambda d, s: get_contributions_from_db(d.competition_id, s, Page(limit=100)),
+    'complexes': lambda d, s: get_all_complexes_from_db(d.competition_id, s, Page(limit=100), is_qualifying=False),
+    'participants page': lambda d, s: get_all_participants_from_db(d.competition_id, s, Page(limit=100)),
+    'participants filtered': lambda d, s: get_all_participants_from_db(
+        d.competition_id, s, Page(limit=100), is_qualified=True, is_arrived=False
+    ),
+    'results by participant': lambda d, s: get_all_result_complexes_from_db(
+        d.complex_id, s, ResultOrder.participant, Page(limit=100)
+    ),
+    'results by rank': lambda d, s: get_all_result_complexes_from_db(
+        d.complex_id, s, ResultOrder.rank, Page(limit=100)
+    ),
+    'complex leaderboard': lambda d, s: get_complex_leaderboard_from_db(d.complex_id, s),
+    'competition leaderboard': lambda d, s: get_competition_leaderboard_from_db(d.competition_id, s),
+    'user': lambda d, s: get_user_from_db(d.username, s),
+    'participants export': lambda d, s: s.execute(participants_export_query(d.competition_id)),
+    'results export': lambda d, s: s.execute(results_export_query(d.competition_id)),
+    'check-in': lambda d, s: check_in_participants_from_db(
+        d.competition_id, [CheckIn(participant_id=d.participant_id), CheckIn(email=d.email)], s
+    ),
+    'qualifying lease': lambda d, s: lease_qualification_video_from_db('explain', s, competition_id=d.competition_id),
+    'qualification cut': lambda d, s: qualify_participants_from_db(d.competition_id, s, top=100),
+    'result corrections': lambda d, s: correct_results_from_db(d.complex_id, [
+        ResultCorrection(participant_id=d.participant_id, view=ViewResult.reps, result='100', version=1)
+    ], s),
+    'results import': lambda d, s: import_results_from_db(d.complex_id, [
+        (1, {'participant_id': d.participant_id, 'view': 'reps', 'result': '100'}),
+        (2, {'email': d.email, 'view': 'reps', 'result': '100'}),
+    ], s),
+    'participant children': lambda d, s: participant_children(d.participant_id, s),
+    'participant delete': lambda d, s: participant_delete(d.participant_id, s),
+    'purge chunks': lambda d, s: purge_chunks(d.competition_id, s),
+}
+
+
+def seq_scans(plan: dict, large: set[str]) -> list[str]:
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in large:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', ()):
+        found.extend(seq_scans(child, large))
+    return found
+
+
+def run(coroutine):
+    # every test runs in its own event loop, pooled connections must not outlive it
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+async def seed() -> Dataset:
+    async with async_session() as session:
+        competitions, participants = (await session.execute(
+            select(func.count(func.distinct(Competitions.id)), func.count(Participants.id))
+            .select_from(Competitions).outerjoin(Participants)
+            .where(Competitions.name.startswith(generate_dataset.NAME_PREFIX))
+        )).one()
+    if (competitions, participants) != (COMPETITIONS, COMPETITIONS * PARTICIPANTS):
+        await generate_dataset.main(
+            SEED, COMPETITIONS, PARTICIPANTS, generate_dataset.COMPLEXES_PER_COMPETITION, replace=True
+        )
+
+    async with async_session() as session:
+        large = set(await session.scalars(text(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace "
+            'AND reltuples >= :min_rows'
+        ), {'min_rows': MIN_ROWS}))
+        competition_id = await session.scalar(
+            select(Competitions.id).where(Competitions.name.startswith(generate_dataset.NAME_PREFIX))
+            .order_by(Competitions.id.desc()).limit(1)
+        )
+        complex_id = await session.scalar(
+            select(Complexes.id).where(Complexes.competition_id == competition_id, Complexes.is_qualifying.is_(False))
+            .limit(1)
+        )
+        participant = (await session.execute(
+            select(Participants.id, Participants.email).where(Participants.competition_id == competition_id)
+            .order_by(Participants.id).limit(1)
+        )).one()
+        username = await session.scalar(select(Users.username).limit(1)) or 'nobody'
+    return Dataset(large, competition_id, complex_id, participant.id, participant.email, username)
+
+
+@pytest.fixture(scope='module')
+def dataset() -> Dataset:
+    try:
+        return run(seed())
+    except (exc.DBAPIError, OSError) as error:
+        pytest.skip(f'database not reachable: {error}')
+
+
+async def explain(case, dataset: Dataset) -> list[tuple[str, list[str]]]:
+    """ (statement, large tables it scans) for every statement the case sends """
+    captured: list[tuple[str, dict]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINED):
+            captured.append((statement, parameters))
+
+    leaderboard_cache.clear()
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        # commits of the case only release savepoints, the outer rollback undoes every write
+        session = AsyncSession(bind=connection, join_transaction_mode='create_savepoint', expire_on_commit=False)
+        event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            await case(dataset, session)
+        finally:
+            event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+        plans = []
+        for statement, parameters in captured:
+            plan = (await connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters)).scalar()
+            plans.append((' '.join(statement.split())[:160], seq_scans(plan[0]['Plan'], dataset.large)))
+        await session.close()
+        await transaction.rollback()
+    return plans
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_no_seq_scan_over_large_tables(dataset, name):
+    plans = run(explain(CASES[name], dataset))
+    assert plans, f'{name} sent no statement'
+    assert not [(statement, scans) for statement, scans in plans if scans]
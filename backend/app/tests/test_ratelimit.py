@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from ..core import ratelimit
+from ..core.ratelimit import MemoryBucketStore, RateLimit, parse_limit
+
+
+@pytest.fixture
+def clock(patch_clock):
+    return patch_clock(ratelimit)
+
+
+def take(store: MemoryBucketStore, key: str, limit: RateLimit, cost: int = 1) -> float:
+    return asyncio.run(store.take(key, limit, cost))
+
+
+def test_parse_limit():
+    limit = parse_limit('20/60')
+    assert limit.burst == 20 and limit.rate == pytest.approx(1 / 3)
+    assert parse_limit('5').rate == 5
+    assert parse_limit('') is None
+
+
+@pytest.mark.parametrize('limit', ['0/60', '10/0', 'ten/60'])
+def test_parse_limit_rejects(limit):
+    with pytest.raises(ValueError):
+        parse_limit(limit)
+
+
+def test_burst_then_wait_for_refill(clock):
+    store = MemoryBucketStore(maxsize=100, idle=3600)
+    limit = RateLimit(3, 30)
+    assert [take(store, 'login:ip:1', limit) for _ in range(3)] == [0, 0, 0]
+    assert take(store, 'login:ip:1', limit) == pytest.approx(10)
+    clock.now += 4
+    # a refused take does not consume, so the wait only shrinks
+    assert take(store, 'login:ip:1', limit) == pytest.approx(6)
+    clock.now += 6
+    assert take(store, 'login:ip:1', limit) == 0
+    assert take(store, 'login:ip:1', limit) == pytest.approx(10)
+
+
+def test_buckets_are_per_key_and_refill_up_to_burst(clock):
+    store = MemoryBucketStore(maxsize=100, idle=3600)
+    limit = RateLimit(2, 2)
+    assert [take(store, 'a', limit) for _ in range(3)] == [0, 0, pytest.approx(1)]
+    assert take(store, 'b', limit) == 0
+    clock.now += 3600
+    assert [take(store, 'a', limit) for _ in range(3)] == [0, 0, pytest.approx(1)]
+
+
+def test_cost_above_the_available_tokens(clock):
+    store = MemoryBucketStore(maxsize=100, idle=3600)
+    limit = RateLimit(10, 10)
+    assert take(store, 'batch', limit, cost=8) == 0
+    assert take(store, 'batch', limit, cost=5) == pytest.approx(3)
+
+
+def test_take_is_a_no_op_when_disabled(monkeypatch):
+    calls = []
+
+    class Store:
+        async def take(self, key, limit, cost=1):
+            calls.append(key)
+            return 5.0
+
+    monkeypatch.setattr(ratelimit, 'bucket_store', Store())
+    assert asyncio.run(ratelimit.take('login', 'ip:1', None)) == 0
+    monkeypatch.setattr(ratelimit.settings, 'RATE_LIMIT_ENABLED', False)
+    assert asyncio.run(ratelimit.take('login', 'ip:1', RateLimit(1, 1))) == 0
+    monkeypatch.setattr(ratelimit.settings, 'RATE_LIMIT_ENABLED', True)
+    assert asyncio.run(ratelimit.take('login', 'ip:1', RateLimit(1, 1))) == 5.0
+    assert calls == ['login:ip:1']
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from ..core.scoring import (
+    CAP_OFFSET, UNSCORED, parse_result, placement_matrix, rank, score_result, standings
+)
+from ..db.models import ViewResult
+
+
+@pytest.mark.parametrize('view, raw, expected', [
+    (ViewResult.kg, '100', (-100.0, UNSCORED)),
+    (ViewResult.kg, ' 102,5 kg ', (-102.5, UNSCORED)),
+    (ViewResult.meters, '1500m', (-1500.0, UNSCORED)),
+    (ViewResult.reps, '87 reps', (-87.0, UNSCORED)),
+    (ViewResult.min, '4:05', (245.0, UNSCORED)),
+    (ViewResult.min, '1:02:03.5', (3723.5, UNSCORED)),
+    (ViewResult.min, '12', (720.0, UNSCORED)),
+    (ViewResult.cl, 'cap+45', (CAP_OFFSET - 45, UNSCORED)),
+    (ViewResult.cl, 'CL 45 reps', (CAP_OFFSET - 45, UNSCORED)),
+    (ViewResult.reps, '120 tb 4:30', (-120.0, 270.0)),
+    ('kg', '80', (-80.0, UNSCORED)),
+])
+def test_parse_result(view, raw, expected):
+    assert parse_result(view, raw) == expected
+
+
+@pytest.mark.parametrize('view, raw', [
+    (ViewResult.kg, 'heavy'),
+    (ViewResult.kg, '-5'),
+    (ViewResult.min, '4:75'),
+    (ViewResult.cl, 'cap'),
+    (ViewResult.reps, '120 tb soon'),
+])
+def test_parse_result_rejects(view, raw):
+    with pytest.raises(ValueError):
+        parse_result(view, raw)
+
+
+def test_score_result_ranks_unreadable_last():
+    assert score_result(ViewResult.kg, 'heavy') == (UNSCORED, UNSCORED)
+    assert score_result(ViewResult.kg, '100') < score_result(ViewResult.kg, '90') < (UNSCORED, UNSCORED)
+
+
+def test_capped_lands_after_every_finisher():
+    slowest = score_result(ViewResult.min, '59:59')
+    assert slowest < score_result(ViewResult.cl, 'cap+200') < score_result(ViewResult.cl, 'cap+10')
+
+
+def test_rank_shares_places_1224():
+    groups = np.array([1, 1, 1, 1, 2, 2])
+    scores = np.array([30.0, 10.0, 20.0, 20.0, 5.0, 5.0])
+    tiebreaks = np.full(6, UNSCORED)
+    assert rank(groups, scores, tiebreaks).tolist() == [4, 1, 2, 2, 1, 1]
+
+
+def test_rank_tiebreak_and_unscored():
+    groups = np.zeros(4, dtype=np.int64)
+    scores = np.array([-100.0, -100.0, UNSCORED, UNSCORED])
+    tiebreaks = np.array([300.0, 240.0, UNSCORED, UNSCORED])
+    # unscored rows tie with each other, after everyone with a result
+    assert rank(groups, scores, tiebreaks).tolist() == [2, 1, 3, 3]
+
+
+def test_rank_empty():
+    empty = np.array([], dtype=np.float64)
+    assert rank(empty, empty, empty).tolist() == []
+
+
+def test_placement_matrix_fills_missing_with_last_place():
+    matrix = placement_matrix(
+        participant_ids=np.array([10, 20, 30]), complex_ids=np.array([1, 2]),
+        result_participants=np.array([30, 10, 20]), result_complexes=np.array([1, 1, 2]),
+        result_places=np.array([1, 2, 1]),
+    )
+    assert matrix.tolist() == [[2, 3], [3, 1], [1, 3]]
+
+
+def test_standings_breaks_equal_points_by_best_place():
+    matrix = np.array([
+        [2, 2],
+        [1, 3],
+        [3, 1],
+        [4, 4],
+    ])
+    points, places = standings(matrix)
+    assert points.tolist() == [4, 4, 4, 8]
+    assert places.tolist() == [3, 1, 1, 4]
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from ..core.security import (
+    CHECKIN_AUDIENCE, create_access_token, create_checkin_token, read_checkin_token, read_token_subject, settings
+)
+
+
+def test_checkin_token_round_trip():
+    assert read_checkin_token(create_checkin_token(participant_id=7, competition_id=3)) == (7, 3)
+
+
+def test_access_token_is_not_a_checkin_token():
+    assert read_checkin_token(create_access_token({'sub': '7', 'cid': 3})) is None
+
+
+def test_checkin_token_is_not_an_access_token():
+    assert read_token_subject(create_checkin_token(participant_id=7, competition_id=3)) is None
+    assert read_token_subject(create_access_token({'sub': 'judge'})) == 'judge'
+
+
+def test_forged_expired_and_malformed_checkin_tokens():
+    claims = {'sub': '7', 'cid': 3, 'aud': CHECKIN_AUDIENCE, 'exp': datetime.now() + timedelta(days=1)}
+    forged = jwt.encode(claims, 'not the secret', algorithm=settings.ALGORITHM)
+    expired = jwt.encode(
+        {**claims, 'exp': datetime.now() - timedelta(days=1)}, settings.TOKEN_SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+    missing_competition = jwt.encode(
+        {key: value for key, value in claims.items() if key != 'cid'},
+        settings.TOKEN_SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+    not_a_number = jwt.encode({**claims, 'sub': 'judge'}, settings.TOKEN_SECRET_KEY, algorithm=settings.ALGORITHM)
+    for token in (forged, expired, missing_competition, not_a_number, 'garbage'):
+        assert read_checkin_token(token) is None